@@ -14,8 +14,28 @@ portfolio_gid = os.getenv('PORTFOLIO_GID')
 client_id = os.getenv("CLIENT_ID")
 client_secret = os.getenv("CLIENT_SECRET")
 redirect_uri = "https://arska-sammaleen.eu.pythonanywhere.com/callback"
+webhook_url = os.getenv("WEBHOOK_URL", "https://arska-sammaleen.eu.pythonanywhere.com/asana/webhook")
 auth_url = "https://app.asana.com/-/oauth_authorize"
 
+# asana http client
+asana_pool_size = int(os.getenv("ASANA_POOL_SIZE", 10)) # keep-alive connections per pool
+asana_connect_timeout = float(os.getenv("ASANA_CONNECT_TIMEOUT", 5))
+asana_read_timeout = float(os.getenv("ASANA_READ_TIMEOUT", 30))
+asana_workers = int(os.getenv("ASANA_WORKERS", 8)) # concurrent lookups per call, keep <= pool size
+asana_rate_limit = int(os.getenv("ASANA_RATE_LIMIT", 150)) # requests per minute per token
+asana_burst = int(os.getenv("ASANA_BURST", 15)) # requests a token may send at once
+asana_max_retries = int(os.getenv("ASANA_MAX_RETRIES", 5)) # on 429 / 5xx / connection errors
+asana_backoff = float(os.getenv("ASANA_BACKOFF", 0.5)) # base backoff in seconds
+
+# bot handlers
+async_workers = int(os.getenv("ASYNC_WORKERS", 8)) # threads running blocking services calls
+team_refresh_interval = int(os.getenv("TEAM_REFRESH_INTERVAL", 600)) # seconds between team roster refreshes
+
+# daily task extraction
+extract_workers = int(os.getenv("EXTRACT_WORKERS", 4)) # users fetched concurrently
+extract_chunk_size = int(os.getenv("EXTRACT_CHUNK_SIZE", 10)) # users written per transaction
+extract_lead = int(os.getenv("EXTRACT_LEAD", -1)) # minutes the bot extracts before the first report, opt-in: < 0 (default) leaves it to the external job, enable only once that job is retired
+
 # telegram
 bot_token = os.getenv("BOT_TOKEN")
 report_chat_id = int(os.getenv("REPORT_CHAT_ID")) # test chat
@@ -24,6 +44,14 @@ report_chat_id_pm = os.getenv("REPORT_CHAT_ID_PM") # PM's chat
 report_chat_id_ba = os.getenv("REPORT_CHAT_ID_BA") # BA's chat
 report_chat_id_main = os.getenv("REPORT_CHAT_ID_MAIN") # MAIN
 report_chat_id_av = os.getenv("REPORT_CHAT_ID_AV")
+tg_global_rate = float(os.getenv("TG_GLOBAL_RATE", 25)) # messages per second across all chats, telegram allows ~30
+tg_chat_rate = float(os.getenv("TG_CHAT_RATE", 1)) # messages per second to a private chat
+tg_group_rate = float(os.getenv("TG_GROUP_RATE", 20)) # messages per minute to a group, telegram allows ~20
+tg_group_burst = int(os.getenv("TG_GROUP_BURST", 5)) # messages a group may get at once
+tg_max_retries = int(os.getenv("TG_MAX_RETRIES", 3)) # resends after RetryAfter / network errors
+tg_backoff = float(os.getenv("TG_BACKOFF", 1)) # base backoff in seconds after a network error
+tg_backoff_max = float(os.getenv("TG_BACKOFF_MAX", 30)) # cap of a single backoff
+tg_chat_buckets = int(os.getenv("TG_CHAT_BUCKETS", 1024)) # chats whose rate limit state is kept, least recently used go first
 
 # user lists from json
 cwdir = os.path.dirname(os.path.abspath(__file__))
@@ -37,11 +65,29 @@ pm_users = config.get('PM','')
 ba_users = config.get('BA','')
 av_users = config.get('AV','')
 
+# report routes: which group / format goes to which chat and when
+# from report_routes.json when present, else the main and AV chats
+routes_path = os.path.join(root_dir, 'report_routes.json')
+
+if os.path.exists(routes_path):
+    with open(routes_path, 'r', encoding='utf-8') as routes_file:
+        report_routes = json.load(routes_file)
+else:
+    weekdays = [1, 2, 3, 4, 5] # Mon-Fri, 0 is Sunday
+    report_routes = [
+        {"chat_id": report_chat_id_main, "group": "all", "format": "report", "days": weekdays, "time": "07:05"},
+        {"chat_id": report_chat_id_main, "group": "pm", "format": "report", "days": weekdays, "time": "07:05"},
+        {"chat_id": report_chat_id_av, "group": "av", "format": "report_av", "days": [0, 1, 2, 3, 4, 5, 6], "time": "07:05",
+         "run_on_start": True},
+    ]
+
 # database 
 db_host = os.getenv("DB_HOST")
 db_user = os.getenv("DB_USER")
 db_pass = os.getenv("DB_PASS")
 database = os.getenv("DATABASE")
+db_pool_size = int(os.getenv("DB_POOL_SIZE", 5)) # max 32 for mysql.connector pools
+db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", 10)) # seconds to wait for a free connection
 
 # redis
 rd_host = os.getenv("RD_HOST")
@@ -49,6 +95,14 @@ rd_port = int(os.getenv("RD_PORT"))
 rd_pass = os.getenv("RD_PASS")
 rd_user = os.getenv("RD_USER")
 token_ttl = 518400 # store cache for 6 days
+ancestry_ttl = int(os.getenv("ANCESTRY_TTL", 86400)) # task -> parent/projects cache, 1 day
+ancestry_negative_ttl = int(os.getenv("ANCESTRY_NEGATIVE_TTL", 3600)) # orphan tasks, 1 hour
+report_snapshot_ttl = int(os.getenv("REPORT_SNAPSHOT_TTL", 86400)) # daily report snapshot, 1 day
+task_store_ttl = int(os.getenv("TASK_STORE_TTL", 86400)) # synced today tasks per user, 1 day
+task_store_fresh_ttl = int(os.getenv("TASK_STORE_FRESH_TTL", 900)) # store served without asana calls while webhooks push, 15 mins
+user_cache_size = int(os.getenv("USER_CACHE_SIZE", 512)) # user data entries kept in process memory
+user_cache_ttl = int(os.getenv("USER_CACHE_TTL", 300)) # in-process user data, 5 mins
+note_ttl = int(os.getenv("NOTE_TTL", 86400)) # cached note of the day, 1 day
 
 # misc
 gs_url = os.getenv("GS_URL")
@@ -3,49 +3,53 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotComm
 from telegram.ext import Application, CommandHandler, CallbackContext, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 
 import pandas as pd
+import mysql.connector
+import redis.exceptions
 from pathlib import Path
-from datetime import datetime, time
+from datetime import datetime, timedelta
+from time import perf_counter
 
 from flask import Flask, request, jsonify
 import logging
 
 from services.redis_client import get_redis_client
 
-from services.oauth_service import gen_oauth_link, store_oauth_data, get_oauth_data, get_token
+from services.oauth_service import gen_oauth_link, get_oauth_data, get_token
+from services.webhook_service import handle_webhook
 
 from services.asana_data import (get_user_name,
                                  get_user_gid,
                                  get_user_data,
-                                 save_asana_data,
-                                 get_redis_data,
-                                 get_tasks,
-                                 get_note,
-                                 format_df, 
-                                 store_note,
-                                 get_report,
-                                 get_report_pm,
-                                 get_report_ba,
-                                 get_report_av,
-                                 get_tg_user,
-                                 format_report,
-                                 format_report_av,
-                                 get_asana_users
+                                 save_asana_data
+                                 )
+from services.telegram_dispatch import send_messages, dispatch
+from services.report_routes import load_routes, schedule_routes, routes_for_day
+from services.task_cache import get_ancestry_cache_stats
+from services.asana_client import get_rate_limit_stats
+from services.render import render_mytasks, df_rows, text_limit, caption_limit
+
+from services.async_data import (store_oauth_data_async,
+                                 get_redis_data_async,
+                                 get_user_context_async,
+                                 get_tasks_async,
+                                 store_note_async,
+                                 is_team_member_async,
+                                 refresh_team_members_async,
+                                 get_group_messages_async,
+                                 load_tg_users_async,
+                                 listen_user_data_invalidation_async,
+                                 build_outbox_async,
+                                 extract_daily_tasks_async,
+                                 shutdown_executor
                                  )
 
 from config.load_env import (bot_token,
                              asana_token,
                              workspace_gid,
                              team_gid,
-                             gs_url,
-                             report_chat_id, 
-                             report_chat_id_ar,
-                             report_chat_id_pm, 
-                             report_chat_id_ba,
-                             report_chat_id_main,
-                             report_chat_id_av,
-                             pm_users,
-                             ba_users,
-                             av_users
+                             team_refresh_interval,
+                             extract_lead,
+                             gs_url
                              )
 
 # set logger 
@@ -75,7 +79,7 @@ async def start_command(update: Update, context: CallbackContext):
     tg_user = update.effective_user.username or ""
     
     oauth_link, state = gen_oauth_link()  # generate oauth link
-    store_oauth_data(user_id, tg_user, state) # store the state in Redis along with user_id mapping
+    await store_oauth_data_async(user_id, tg_user, state) # store the state in Redis along with user_id mapping
     logger.info(f"bot started by user: {user_id}/{tg_user}, state: {state}")
     
     keyboard = [[InlineKeyboardButton("Connect to Asana 🔑", url=oauth_link)]]
@@ -120,7 +124,7 @@ async def connect_command(update: Update, context: CallbackContext):
     tg_user = update.effective_user.username
     
     oauth_link, state = gen_oauth_link()  # generate oauth link
-    store_oauth_data(user_id, tg_user, state) # store the state in Redis along with user_id mapping
+    await store_oauth_data_async(user_id, tg_user, state) # store the state in Redis along with user_id mapping
     logger.info(f"auth process for user: {user_id}/{tg_user}, state: {state}")
     
     keyboard = [[InlineKeyboardButton("OAuth Link", url=oauth_link)]]
@@ -135,31 +139,59 @@ async def mytasks_command(update: Update, context: CallbackContext):
     keyboard = [[InlineKeyboardButton("Add notes ✍", callback_data="add_notes")]]   
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    #fetch tasks and note, format message
+    #fetch creds, note and list gid in one redis round trip, then tasks, format message
     user_id = update.effective_user.id
-    df = get_tasks(user_id, workspace_gid)
-    extra_note = get_note(user_id)
+    started = perf_counter()
+    
+    user_context = await get_user_context_async(user_id)
+    context_done = perf_counter()
+    
+    if user_context is not None:
+        df = await get_tasks_async(user_id, workspace_gid, user_context=user_context)
+        extra_note = user_context['note']
+    else:
+        df, extra_note = pd.DataFrame(), None
+    tasks_done = perf_counter()
     
+    # first page fits the photo caption, the rest follows as messages
     if not df.empty: 
-        mytasks_message = format_df(df, extra_note, max_len=1024, max_note_len=85)
+        mytasks_pages = render_mytasks(df_rows(df), extra_note, max_note_len=85,
+                                       limit=text_limit, first_limit=caption_limit)
     else:
-        mytasks_message = (
+        mytasks_pages = [(
             f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
             "<code>No tasks for today</code>"
-        )
+        )]
     
     await context.bot.send_photo(
         chat_id=update.effective_chat.id,
         photo=open(Path(__file__).parent / "assets/mytasks.png", "rb"),
-        caption=mytasks_message,
+        caption=mytasks_pages[0],
         parse_mode="HTML",
         reply_markup=reply_markup
     )
+    
+    await send_messages(context.bot, update.effective_chat.id, mytasks_pages[1:], parse_mode="HTML")
+    
+    logger.info(
+        f"/mytasks for user {user_id}: context {(context_done - started) * 1000:.0f}ms, "
+        f"tasks {(tasks_done - context_done) * 1000:.0f}ms, "
+        f"total {(perf_counter() - started) * 1000:.0f}ms"
+    )
+    
+    # process totals since start
+    ancestry_stats = get_ancestry_cache_stats()
+    rate_stats = get_rate_limit_stats()
+    logger.info(f"ancestry cache: {ancestry_stats['hits']} hits, {ancestry_stats['misses']} misses, "
+                f"hit rate {ancestry_stats['hit_rate']:.0%}; "
+                f"asana rate limits: waited {rate_stats['wait_seconds']:.1f}s, "
+                f"{rate_stats['throttled']} throttled, {rate_stats['retries']} retries")
  
  
 # ADD NOTES button
 # add notes callback
 
+# per user note flow state, shared by the note handlers below
 note_input_state = {}
 
 async def add_notes_callback(update: Update, context: CallbackContext):
@@ -181,7 +213,7 @@ async def add_notes_callback(update: Update, context: CallbackContext):
 # handle user response 
 async def note_input_(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    user_gid, user_name, user_token, tg_user = await get_redis_data_async(user_id)
     chat_id = note_input_state.get(user_id, {}).get("chat_id")
     
     if chat_id:
@@ -218,22 +250,21 @@ async def note_input_(update: Update, context: CallbackContext):
 
 async def note_input(update: Update, context: CallbackContext):
     
+    # updates run concurrently: the state is read and written before any await
     user_id = update.effective_user.id
-    if user_id not in note_input_state:
-        return
-    
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
-    chat_id = note_input_state[user_id].get("chat_id")
+    state = note_input_state.get(user_id)
     
-    if not chat_id:
+    if not state or not state.get("chat_id"):
         return
     
     if not update.effective_message or not update.effective_message.text:
         return
     
-
+    chat_id = state["chat_id"]
     note_text = update.effective_message.text
-    note_input_state[user_id]["note"] = note_text 
+    state["note"] = note_text 
+    
+    user_gid, user_name, user_token, tg_user = await get_redis_data_async(user_id)
     
     keyboard = [
         [
@@ -259,55 +290,61 @@ async def note_input(update: Update, context: CallbackContext):
 async def process_note(update: Update, context: CallbackContext):
     query = update.callback_query
     user_id = query.from_user.id
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    data = query.data
+    
+    # saving claims the state before any await, so a second click can't store the note twice
+    if data == "confirm_note":
+        state = note_input_state.pop(user_id, None)
+    else:
+        state = note_input_state.get(user_id)
+    
+    if state is None:
+        await query.answer("Use command '/mytasks' again")
+        return
+    
+    chat_id = state["chat_id"]
+    note = state.get("note")
+    
+    # re-write note
+    if data == "edit_note": 
+        state["status"] = "awaiting_new_note"  
+        state["note"] = None  
+    
+    user_gid, user_name, user_token, tg_user = await get_redis_data_async(user_id)
+    logger.info(f"{user_id}/{user_name} clicked button {data}")
 
-    if user_id in note_input_state:
-        data = query.data
-        chat_id = note_input_state[user_id]["chat_id"]
-        note = note_input_state[user_id].get("note")
+    # save note
+    if data == "confirm_note": 
+        success = await store_note_async(note, user_id)
         
-        logger.info(f"{user_id}/{user_name} clicked button {data}")
-
-        # save note
-        if data == "confirm_note": 
-            success = store_note(note, user_id)
-            
-            if success:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text="`Заметка сохранена успешно`",
-                    parse_mode="Markdown"
-                )
-            else:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text="`Возникла пробема с сохранением заметки. Пожалуйста, повторите процесс`",
-                    parse_mode="Markdown"
-                )
-            del note_input_state[user_id]  # clear state
-            
-        # re-write note
-        elif data == "edit_note": 
-            note_input_state[user_id]["status"] = "awaiting_new_note"  
-            note_input_state[user_id]["note"] = None  
+        if success:
             await context.bot.send_message(
                 chat_id=chat_id,
-                text="Напишите обновленную заметку"
+                text="`Заметка сохранена успешно`",
+                parse_mode="Markdown"
             )
-    else:
-        await query.answer("Use command '/mytasks' again")
+        else:
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text="`Возникла пробема с сохранением заметки. Пожалуйста, повторите процесс`",
+                parse_mode="Markdown"
+            )
+        
+    elif data == "edit_note": 
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text="Напишите обновленную заметку"
+        )
 
    
 # /REPORT command handler    
 async def report_command(update: Update, context: CallbackContext):
     
     user_id = update.effective_user.id
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    user_gid, user_name, user_token, tg_user = await get_redis_data_async(user_id)
     
-    arska_gids = get_asana_users(asana_token, team_gid)
-    
-    # if user not from arska team
-    if user_gid not in arska_gids:
+    # if user not from arska team, checked against the cached team roster
+    if not await is_team_member_async(user_gid, asana_token, team_gid):
         report_message = "<code>Sorry, you are not authorized to see the data</code>"
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
@@ -317,30 +354,13 @@ async def report_command(update: Update, context: CallbackContext):
         return  
         
     # fetch tasks for report
-    tasks_dict = get_report(user_name, pm_users, ba_users, av_users)
+    reports = await get_group_messages_async('all', user_name=user_name)
     
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        mes_num = len(users)
-        logger.info(f"got report data for {mes_num} users: {users}")
-        
-        # create formatted reports for each user from tasks_dict
-        reports = []
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            reports.append(user_report)
+    if reports:
+        logger.info(f"got report data: {len(reports)} messages")
         
-        # send each report as a separate message 
-        for report in reports:
-            try:
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=report,
-                    parse_mode='HTML'  
-                )   
-            except Exception as err:
-                logger.error(f"error sending report to user: {user_id}/{user_name}")
+        # send each report as a separate message, throttled to the chat's limits
+        await send_messages(context.bot, update.effective_chat.id, reports, parse_mode='HTML')
     else:
         report_message = (
             f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n" 
@@ -356,12 +376,10 @@ async def report_command(update: Update, context: CallbackContext):
 # /PM REPORT command handler    
 async def pm_report_command(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    user_gid, user_name, user_token, tg_user = await get_redis_data_async(user_id)
     
-    arska_gids = get_asana_users(asana_token, team_gid)
-    
-    # if user not from arska team
-    if user_gid not in arska_gids:
+    # if user not from arska team, checked against the cached team roster
+    if not await is_team_member_async(user_gid, asana_token, team_gid):
         report_message = "<code>Sorry, you are not authorized to see the data</code>"
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
@@ -370,30 +388,13 @@ async def pm_report_command(update: Update, context: CallbackContext):
         )
         return 
     
-    tasks_dict = get_report_pm(user_name, pm_users)
+    reports = await get_group_messages_async('pm', user_name=user_name)
     
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        mes_num = len(users)
-        logger.info(f"got PM report data for {mes_num} users: {users}")
-        
-        # create formatted reports for each user from tasks_dict
-        reports = []
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            reports.append(user_report)
+    if reports:
+        logger.info(f"got PM report data: {len(reports)} messages")
         
-        # send each report as a separate message 
-        for report in reports:
-            try:
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=report,
-                    parse_mode='HTML'  
-                )   
-            except Exception as err:
-                logger.error(f"error sending PM report to user: {user_id}/{user_name}")
+        # send each report as a separate message, throttled to the chat's limits
+        await send_messages(context.bot, update.effective_chat.id, reports, parse_mode='HTML')
     else:
         report_message = (
             f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n" 
@@ -409,12 +410,10 @@ async def pm_report_command(update: Update, context: CallbackContext):
 # /BA REPORT command handler    
 async def ba_report_command(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
-    
-    arska_gids = get_asana_users(asana_token, team_gid)
+    user_gid, user_name, user_token, tg_user = await get_redis_data_async(user_id)
     
-    # if user not from arska team
-    if user_gid not in arska_gids:
+    # if user not from arska team, checked against the cached team roster
+    if not await is_team_member_async(user_gid, asana_token, team_gid):
         report_message = "<code>Sorry, you are not authorized to see the data</code>"
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
@@ -423,30 +422,13 @@ async def ba_report_command(update: Update, context: CallbackContext):
         )
         return 
     
-    tasks_dict = get_report_ba(user_name, ba_users)
+    reports = await get_group_messages_async('ba', user_name=user_name)
     
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        mes_num = len(users)
-        logger.info(f"got BA report data for {mes_num} users: {users}")
+    if reports:
+        logger.info(f"got BA report data: {len(reports)} messages")
         
-        # create formatted reports for each user from tasks_dict
-        reports = []
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            reports.append(user_report)
-        
-        # send each report as a separate message 
-        for report in reports:
-            try:
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=report,
-                    parse_mode='HTML'  
-                )   
-            except Exception as err:
-                logger.error(f"error sending PM report to user: {user_id}/{user_name}")
+        # send each report as a separate message, throttled to the chat's limits
+        await send_messages(context.bot, update.effective_chat.id, reports, parse_mode='HTML')
     else:
         report_message = (
             f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n" 
@@ -462,6 +444,15 @@ async def ba_report_command(update: Update, context: CallbackContext):
 # MENU bot post initialization
 async def post_init(application: Application) -> None:
     
+    # tg users index for reports, one HMGET per report instead of a query per user
+    await load_tg_users_async()
+    
+    # re-authorized users' creds are dropped from the in-process cache as the oauth callback saves them
+    try:
+        application.bot_data['user_data_listener'] = await listen_user_data_invalidation_async()
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err}, cached user data expires by ttl only")
+    
     await application.bot.set_my_commands(
         [BotCommand('start', 'go to start message'),
          BotCommand('connect', 'connect to Asana'),
@@ -480,6 +471,16 @@ async def post_init(application: Application) -> None:
     await application.bot.set_chat_menu_button()
 
 
+# stop the user data listener and the services executor after the bot shuts down
+async def post_shutdown(application: Application) -> None:
+    
+    listener = application.bot_data.get('user_data_listener')
+    if listener is not None:
+        listener.stop()
+    
+    shutdown_executor()
+
+
 # OAuth callback route
 @ app.route("/callback", methods=["GET"])
 
@@ -543,258 +544,66 @@ def callback():
         "user_gid": user_gid,
         "user_token": "present, saved"
     }), 200
-   
 
-# SCHEDULERS ---------------------
-# general report
-async def scheduled_report(context: ContextTypes.DEFAULT_TYPE):
-    
-    logger.info("running scheduled report for TEST...")
-    
-    tasks_dict = get_report(None, pm_users, ba_users, av_users)  
 
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        logger.info(f"got scheduled report data for {len(users)} users: {users}")
+# Asana webhook route, target: /asana/webhook?user_id=<tg user_id>
+@ app.route("/asana/webhook", methods=["POST"])
 
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            
-            try:
-                await context.bot.send_message(
-                    chat_id=report_chat_id,
-                    text=user_report,
-                    parse_mode='HTML'
-                )
-            except Exception as err:
-                logger.error(f"error sending scheduled report for TEST: {err}")
-    else:
-        report_message = (
-            f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
-            "<code>No data is present for now</code>"
-        )
-        await context.bot.send_message(
-            chat_id=report_chat_id,
-            text=report_message,
-            parse_mode="HTML"
-        )
-      
-      
-# general report
-async def scheduled_report_ar(context: ContextTypes.DEFAULT_TYPE):
+def asana_webhook():
     
-    logger.info("running scheduled report for ARSKA ...")
+    # raw body is needed for the signature check
+    body = request.get_data()
+    events = (request.get_json(silent=True) or {}).get('events', [])
     
-    tasks_dict = get_report(None, pm_users, ba_users, av_users)  
-
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        logger.info(f"got scheduled report data for {len(users)} users: {users}")
-
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            
-            try:
-                await context.bot.send_message(
-                    chat_id=report_chat_id_ar,
-                    text=user_report,
-                    parse_mode='HTML'
-                )
-            except Exception as err:
-                logger.error(f"error sending scheduled report for ARSKA: {err}")
-    else:
-        report_message = (
-            f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
-            "<code>No data is present for now</code>"
-        )
-        await context.bot.send_message(
-            chat_id=report_chat_id_ar,
-            text=report_message,
-            parse_mode="HTML"
-        )      
-      
-      
-# pm report
-async def scheduled_report_pm(context: ContextTypes.DEFAULT_TYPE):
-    
-    logger.info("running scheduled PM report ...")
-    
-    tasks_dict = get_report_pm(None, pm_users)  
+    payload, status, headers = handle_webhook(request.args.get('user_id'), request.headers, body, events)
+    return jsonify(payload), status, headers
+   
 
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        logger.info(f"got scheduled PM report data for {len(users)} users: {users}")
+# SCHEDULERS ---------------------
+# team roster refresh for report authorization
+async def refresh_team_members_job(context: ContextTypes.DEFAULT_TYPE):
+    await refresh_team_members_async(asana_token, team_gid)
 
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            
-            try:
-                await context.bot.send_message(
-                    chat_id=report_chat_id_pm,
-                    text=user_report,
-                    parse_mode='HTML'
-                )
-            except Exception as err:
-                logger.error(f"error sending scheduled report for PM: {err}")
-    else:
-        report_message = (
-            f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
-            "<code>No data is present for now</code>"
-        )
-        await context.bot.send_message(
-            chat_id=report_chat_id_pm,
-            text=report_message,
-            parse_mode="HTML"
-        )
 
-# ba report
-async def scheduled_report_ba(context: ContextTypes.DEFAULT_TYPE):
+# daily extraction of today tasks into 'tasks', ahead of the reports
+async def extraction_job(context: ContextTypes.DEFAULT_TYPE):
     
-    logger.info("running scheduled BA report ...")
-    
-    tasks_dict = get_report_ba(None, ba_users)  
-
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        logger.info(f"got scheduled BA report data for {len(users)} users: {users}")
-
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            
-            try:
-                await context.bot.send_message(
-                    chat_id=report_chat_id_ba,
-                    text=user_report,
-                    parse_mode='HTML'
-                )
-            except Exception as err:
-                logger.error(f"error sending scheduled BA report: {err}")
-    else:
-        report_message = (
-            f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
-            "<code>No data is present for now</code>"
-        )
-        await context.bot.send_message(
-            chat_id=report_chat_id_ba,
-            text=report_message,
-            parse_mode="HTML"
-        )
+    try:
+        await extract_daily_tasks_async()
+    except mysql.connector.Error as err:
+        logger.error(f"DB error: {err} during daily extraction")
 
 
-# main report separate
-async def scheduled_report_main(context: ContextTypes.DEFAULT_TYPE):
+# report routes sharing a time: shared data is built once, per-chat views are sent in parallel
+async def scheduled_reports(context: ContextTypes.DEFAULT_TYPE):
     
-    logger.info("running scheduled report for ARSKA ...")
+    # isoweekday() % 7 -> 0 is Sunday, as in run_daily days
+    today = datetime.now(context.job_queue.scheduler.timezone)
+    routes = routes_for_day(context.job.data, today.isoweekday() % 7)
     
-    tasks_dict = get_report(None, pm_users, ba_users, av_users)  
-
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        logger.info(f"got scheduled report data for {len(users)} users: {users}")
-
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            
-            try:
-                await context.bot.send_message(
-                    chat_id=report_chat_id_main,
-                    text=user_report,
-                    parse_mode='HTML'
-                )
-            except Exception as err:
-                logger.error(f"error sending scheduled report for ARSKA: {err}")
-    else:
-        report_message = (
-            f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
-            "<code>No data is present for now</code>"
-        )
-        await context.bot.send_message(
-            chat_id=report_chat_id_main,
-            text=report_message,
-            parse_mode="HTML"
-        )      
-        
-async def scheduled_report_main_pm(context: ContextTypes.DEFAULT_TYPE):
+    if not routes:
+        return
     
-    logger.info("running scheduled PM report ...")
+    logger.info(f"running scheduled reports for {len(routes)} routes ...")
     
-    tasks_dict = get_report_pm(None, pm_users)  
-
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        logger.info(f"got scheduled PM report data for {len(users)} users: {users}")
-
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            user_report = format_report(user_df, user, tg_user_name, max_len=4000, max_note_len=60)
-            
-            try:
-                await context.bot.send_message(
-                    chat_id=report_chat_id_main,
-                    text=user_report,
-                    parse_mode='HTML'
-                )
-            except Exception as err:
-                logger.error(f"error sending scheduled report for PM: {err}")
-    else:
-        report_message = (
-            f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
-            "<code>No data is present for now</code>"
-        )
-        await context.bot.send_message(
-            chat_id=report_chat_id_main,
-            text=report_message,
-            parse_mode="HTML"
-        )   
- 
-        
-# report for AV
-async def scheduled_report_av(context: ContextTypes.DEFAULT_TYPE):
-    logger.info("running scheduled report for AV ...")
-    tasks_dict = get_report_av(None, av_users)
-
-    if tasks_dict:
-        users = list(tasks_dict.keys())
-        logger.info(f"got scheduled AV report data for {len(users)} users: {users}")
-
-        for user, user_df in tasks_dict.items():
-            tg_user_name = get_tg_user(user)
-            # now returns a list of HTML-safe strings, each ≤ max_len
-            user_reports = format_report_av(
-                user_df, user, tg_user_name,
-                max_len=4000, max_note_len=60
-            )
-
-            for report in user_reports:
-                try:
-                    await context.bot.send_message(
-                        chat_id=report_chat_id_av,
-                        text=report,
-                        parse_mode='HTML'
-                    )
-                except Exception as err:
-                    logger.error(f"error sending scheduled report for AV: {err}")
-    else:
-        report_message = (
-            f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
-            "<code>No data is present for now</code>"
-        )
-        await context.bot.send_message(
-            chat_id=report_chat_id_av,
-            text=report_message,
-            parse_mode="HTML"
-        )
+    outbox = await build_outbox_async(routes)
+    sent = await dispatch(context.bot, outbox, parse_mode='HTML')
+    
+    logger.info(f"scheduled reports sent: {sent}")
 
                 
 # bot initialization 
 def create_bot_app():
     
-    bot_app = Application.builder().token(bot_token).post_init(post_init).build()
+    # updates of different users are handled concurrently, blocking calls run in services_executor
+    bot_app = (
+        Application.builder()
+        .token(bot_token)
+        .concurrent_updates(True)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # command handlers
     bot_app.add_handler(CommandHandler("chatid", chat_id_command)) 
@@ -819,54 +628,28 @@ def main():
     
     job_queue = bot_app.job_queue
     
-    # scheduled run for TEST
-    #job_queue.run_daily(
-    #    scheduled_report,
-    #    time=time(hour=7, minute=5),
-    #    days=(1, 2, 3, 4, 5)  # Mon-Fri
-    #)
-    
-    # scheduled run for MAIN 
-    #job_queue.run_daily(
-    #    scheduled_report_ar,
-    #    time=time(hour=7, minute=5),
-    #    days=(1, 2, 3, 4, 5)  # Mon-Fri
-    #)
-    
-    # scheduled run for MAIN separate 
-    job_queue.run_daily(
-        scheduled_report_main,
-        time=time(hour=7, minute=5),
-        days=(1, 2, 3, 4, 5)  # Mon-Fri
-        )
-        
-    job_queue.run_daily(
-        scheduled_report_main_pm,
-        time=time(hour=7, minute=5),
-        days=(1, 2, 3, 4, 5)  # Mon-Fri
-        )
+    # team roster, report commands check membership against the cached set
+    job_queue.run_repeating(refresh_team_members_job, interval=team_refresh_interval, first=1)
     
-    job_queue.run_daily(
-        scheduled_report_av,
-        time=time(hour=7, minute=5),
-        days=(0, 1, 2, 3, 4, 5, 6)  # Mon-Sun
-        )
+    # scheduled reports from the routing table, one job per time, each route runs on its own days
+    routes = load_routes()
+    
+    for report_time, days, schedule in schedule_routes(routes):
+        job_queue.run_daily(scheduled_reports, time=report_time, days=days, data=schedule)
+    
+    # extraction runs extract_lead minutes before the first report of the day, opt-in:
+    # the external extraction also writes 'tasks', only one of them may run
+    if routes and extract_lead >= 0:
+        first_report = datetime.combine(datetime.today(), min(route['time'] for route in routes))
+        extract_at = max(first_report - timedelta(minutes=extract_lead), first_report.replace(hour=0, minute=0))
+        job_queue.run_daily(extraction_job, time=extract_at.time())
+        logger.info(f"daily extraction scheduled at {extract_at.time()}")
+    else:
+        logger.info("daily extraction is left to the external job, set EXTRACT_LEAD to run it in the bot")
     
-    job_queue.run_once(scheduled_report_av, when=1)
-    
-    # scheduled run for PM 
-    #job_queue.run_daily(
-        #scheduled_report_pm,
-        #time=time(hour=7, minute=5),
-        #days=(1, 2, 3, 4, 5)  # Mon-Fri
-    #)
-    
-    # scheduled run for BA
-    #job_queue.run_daily(
-        #scheduled_report_ba,
-        #time=time(hour=7, minute=5),
-        #days=(1, 2, 3, 4, 5)  # Mon-Fri
-    #)
+    start_routes = [route for route in routes if route['run_on_start']]
+    if start_routes:
+        job_queue.run_once(scheduled_reports, when=1, data=start_routes)
  
     bot_app.run_polling()
 
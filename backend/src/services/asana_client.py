@@ -0,0 +1,239 @@
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
+from config.load_env import (asana_pool_size,
+                             asana_connect_timeout,
+                             asana_read_timeout,
+                             asana_rate_limit,
+                             asana_burst,
+                             asana_max_retries,
+                             asana_backoff)
+
+import logging
+logger = logging.getLogger(__name__)
+
+asana_api_url = "https://app.asana.com/api/1.0"
+asana_batch_size = 10 # max actions per /batch request
+asana_timeout = (asana_connect_timeout, asana_read_timeout)
+
+# one keep-alive session for app.asana.com, connections are reused between calls
+asana_session = requests.Session()
+asana_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=asana_pool_size)
+asana_session.mount("https://", asana_adapter)
+
+
+def get_asana_session():
+    return asana_session
+
+
+# auth headers are set per call, so every token shares the same pool
+def auth_headers(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+# TOKEN BUCKET - refills `rate` requests per second up to `capacity`
+class TokenBucket:
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    # returns seconds to wait before `cost` requests may be sent, 0 if they may go now
+    def reserve(self, cost=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+    
+    # drain the bucket when asana says we are over the limit anyway
+    def pause(self, seconds):
+        with self.lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+            self.updated = time.monotonic()
+
+
+token_buckets = {}
+buckets_lock = threading.Lock()
+
+# time spent waiting on rate limits by this process
+rate_limit_stats = {"wait_seconds": 0.0, "throttled": 0, "retries": 0}
+stats_lock = threading.Lock()
+
+
+def get_bucket(token):
+    with buckets_lock:
+        bucket = token_buckets.get(token)
+        if bucket is None:
+            bucket = TokenBucket(asana_rate_limit / 60, asana_burst)
+            token_buckets[token] = bucket
+        return bucket
+
+
+def record_wait(seconds, throttled=False, retry=False):
+    with stats_lock:
+        rate_limit_stats["wait_seconds"] += seconds
+        rate_limit_stats["throttled"] += int(throttled)
+        rate_limit_stats["retries"] += int(retry)
+
+
+def get_rate_limit_stats():
+    with stats_lock:
+        return dict(rate_limit_stats)
+
+
+def backoff_delay(attempt):
+    # full jitter exponential backoff
+    return random.uniform(0, asana_backoff * 2 ** attempt)
+
+
+def retry_after(response, attempt):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return backoff_delay(attempt)
+
+
+# REQUEST to asana api: per token bucket, Retry-After on 429, backoff on 5xx / connection errors
+# retries=0 sends the request once, for calls that must not be repeated
+def asana_request(method, url, token=None, cost=1, retries=None, **kwargs):
+    
+    bucket = get_bucket(token) if token else None
+    max_retries = asana_max_retries if retries is None else retries
+    
+    for attempt in range(max_retries + 1):
+        last_attempt = attempt == max_retries
+        
+        if bucket:
+            wait = bucket.reserve(cost)
+            if wait:
+                record_wait(wait)
+                time.sleep(wait)
+        
+        try:
+            response = asana_session.request(method, url, timeout=asana_timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+            if last_attempt:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"asana {method} {url} failed: {err}, retrying in {delay:.1f}s")
+            record_wait(delay, retry=True)
+            time.sleep(delay)
+            continue
+        
+        if response.status_code == 429 and not last_attempt:
+            delay = retry_after(response, attempt)
+            logger.warning(f"asana rate limit hit on {url}, retrying in {delay:.1f}s")
+            record_wait(0.0, throttled=True, retry=True)
+
+            # every caller on this token waits via the bucket, the wait is recorded there
+            if bucket:
+                bucket.pause(delay)
+            else:
+                record_wait(delay)
+                time.sleep(delay)
+            continue
+        
+        if response.status_code >= 500 and not last_attempt:
+            delay = backoff_delay(attempt)
+            logger.warning(f"asana {response.status_code} on {url}, retrying in {delay:.1f}s")
+            record_wait(delay, retry=True)
+            time.sleep(delay)
+            continue
+        
+        return response
+
+
+# GET to asana api, path is relative to /api/1.0 or a full url
+def asana_get(path, token, params=None):
+    url = path if path.startswith("https://") else f"{asana_api_url}{path}"
+
+    return asana_request("GET", url, token, headers=auth_headers(token), params=params)
+
+
+# POST to asana (oauth token exchange etc.)
+def asana_post(url, data=None, json=None, headers=None, token=None, retries=None):
+    request_headers = dict(headers or {})
+    if token:
+        request_headers.update(auth_headers(token))
+
+    return asana_request("POST", url, token, retries=retries, data=data, json=json, headers=request_headers)
+
+
+# BATCH of GET actions via /batch, up to 10 actions per round trip
+# actions are (relative_path, opt_fields list), returns (status_code, data) per action in order
+def asana_batch(actions, token):
+    
+    results = []
+    
+    for i in range(0, len(actions), asana_batch_size):
+        chunk = actions[i:i + asana_batch_size]
+        payload = {
+            "data": {
+                "actions": [
+                    {"method": "get", "relative_path": path, "options": {"fields": fields}}
+                    for path, fields in chunk
+                ]
+            }
+        }
+        
+        # every action counts against the rate limit
+        response = asana_request("POST",
+                                 f"{asana_api_url}/batch",
+                                 token,
+                                 cost=len(chunk),
+                                 json=payload,
+                                 headers=auth_headers(token))
+        response.raise_for_status()
+        
+        for result in response.json().get('data', []):
+            body = result.get('body') or {}
+            results.append((result.get('status_code'), body.get('data')))
+    
+    return results
+
+
+# keep only the given top-level fields of a record
+def project_fields(record, fields):
+    return {field: record.get(field) for field in fields}
+
+
+# ITERATE RECORDS of a paginated list endpoint page by page
+# the next page is fetched in the background while the current one is consumed,
+# predicate / fields filter and project records as they stream in
+def iter_records(path, token, params=None, predicate=None, fields=None):
+    
+    params = dict(params or {})
+    params.setdefault('limit', 100)
+    
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        next_page = prefetcher.submit(asana_get, path, token, dict(params))
+        
+        while next_page is not None:
+            response = next_page.result()
+            response.raise_for_status()
+            
+            json_data = response.json()
+            
+            # check for more pages presence, prefetch it before yielding the current one
+            if json_data.get('next_page'):
+                params['offset'] = json_data['next_page']['offset']
+                next_page = prefetcher.submit(asana_get, path, token, dict(params))
+            else:
+                next_page = None
+            
+            for record in json_data.get('data') or []:
+                if predicate is not None and not predicate(record):
+                    continue
+                yield project_fields(record, fields) if fields else record
@@ -1,13 +1,16 @@
 import requests
 import json
-import html
 import mysql.connector
 import redis
 import redis.exceptions
 import pandas as pd
+import time
+import threading
 from datetime import datetime, date
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from config.load_env import team_gid, asana_token, db_user, db_host, db_pass, database, token_ttl, pm_users, ba_users, av_users
+from config.load_env import team_gid, workspace_gid, asana_token, asana_workers, token_ttl, user_cache_size, user_cache_ttl, note_ttl, team_refresh_interval
 
 import logging
 logger = logging.getLogger(__name__)
@@ -15,44 +18,141 @@ logger = logging.getLogger(__name__)
 from services.redis_client import get_redis_client
 redis_client = get_redis_client()
 
-# GET all users and store in redis
-def get_asana_users(asana_token, team_gid):
+from services.db_client import db_connection
+from services.report_cache import invalidate_report_snapshot
+
+from services.asana_client import asana_get, asana_batch, asana_batch_size, iter_records, project_fields
+from services.task_cache import get_cached_ancestry, cache_ancestry
+from services.task_store import load_task_store, write_task_store
+from services.local_cache import TTLCache
+
+# user_id -> (user_gid, user_name, user_token, tg_user), in front of the redis user_data cache
+# writes are published on user_data_channel, processes listening drop their copy right away,
+# otherwise (listener down, message missed) other processes' writes show up after user_cache_ttl
+user_data_cache = TTLCache(user_cache_size, user_cache_ttl)
+user_data_channel = "user_data_invalidate"
+
+
+# INVALIDATE cached user data here and in every process listening on user_data_channel
+def invalidate_user_data(user_id):
     
-    asana_users = []
+    user_data_cache.invalidate(str(user_id))
     
-    url = f"https://app.asana.com/api/1.0/teams/{team_gid}/users"
-    headers = {'Authorization': f'Bearer {asana_token}'}
+    try:
+        redis_client.publish(user_data_channel, str(user_id))
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while publishing user data invalidation for user: {user_id}")
+
+
+def on_user_data_invalidation(message):
+    user_data_cache.invalidate(message['data'])
+
+
+def on_listener_error(err, pubsub, thread):
+    # the next poll reconnects and subscribes again, entries meanwhile expire by ttl
+    logger.error(f"Redis error: {err} in user data invalidation listener")
+    time.sleep(1)
+
+
+# LISTEN for user data invalidations in a background thread, returns the thread (thread.stop() to end it)
+def listen_user_data_invalidation():
     
-    payload = {
-        'opt_fields': 'name'
-        }
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{user_data_channel: on_user_data_invalidation})
+    
+    return pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=on_listener_error)
+
+
+# My Tasks sections that make up the plan for the day
+today_sections = ['today', 'сегодня', 'фокус']
+
+# task fields kept for /mytasks, modified_at tells the task store what changed
+task_fields = ['gid', 'name', 'due_on', 'projects', 'notes', 'permalink_url', 'modified_at']
+
+
+# team roster in redis, refreshed by a job - the last known set stays when asana fails
+def team_members_key(team_gid):
+    return f"team_members:{team_gid}"
+
+
+# in-process copy of the roster, reloaded from redis every team_refresh_interval
+team_members = {"gids": frozenset(), "loaded_at": None}
+team_members_lock = threading.Lock()
+
+
+def set_local_team_members(gids):
+    with team_members_lock:
+        team_members["gids"] = frozenset(gids)
+        team_members["loaded_at"] = time.monotonic()
+
+
+# REFRESH TEAM MEMBERS from asana into redis, True when the set was replaced
+def refresh_team_members(asana_token, team_gid):
     
     try:
-        response = requests.get(url, headers=headers, params=payload)
-        response.raise_for_status()
-        
-        users_json = response.json()
-        users_df = pd.json_normalize(users_json['data'], max_level=1)
-        asana_users = users_df['gid'].tolist()
-        
+        users = iter_records(f"/teams/{team_gid}/users", asana_token, params={'opt_fields': 'name'}, fields=['gid'])
+        gids = [user['gid'] for user in users]
     except requests.exceptions.RequestException as err:
-        logging.error(f"network errror: {err} trying fetching Asana username")
+        logging.error(f"network errror: {err} while refreshing team members, keeping the last known set")
+        return False
+    
+    if not gids:
+        logging.warning(f"empty team roster from Asana for team: {team_gid}, keeping the last known set")
+        return False
     
-    return asana_users
+    redis_key = team_members_key(team_gid)
+    
+    try:
+        # build aside and swap, readers never see a half-filled set
+        pipe = redis_client.pipeline()
+        pipe.delete(f"{redis_key}:new")
+        pipe.sadd(f"{redis_key}:new", *gids)
+        pipe.rename(f"{redis_key}:new", redis_key)
+        pipe.execute()
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while caching team members")
+    
+    set_local_team_members(gids)
+    logger.info(f"team members refreshed: {len(gids)} users")
+    return True
+
+
+# CHECK TEAM MEMBERSHIP with a set lookup, asana is asked only when no roster was ever cached
+def is_team_member(user_gid, asana_token, team_gid):
+    
+    if user_gid is None:
+        return False
+    
+    with team_members_lock:
+        gids, loaded_at = team_members["gids"], team_members["loaded_at"]
+    
+    if loaded_at is not None and time.monotonic() - loaded_at < team_refresh_interval:
+        return user_gid in gids
+    
+    try:
+        cached_gids = redis_client.smembers(team_members_key(team_gid))
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while reading team members")
+        cached_gids = None
+    
+    if cached_gids:
+        set_local_team_members(cached_gids)
+    elif not refresh_team_members(asana_token, team_gid) and loaded_at is None:
+        return False
+    
+    with team_members_lock:
+        return user_gid in team_members["gids"]
 
 
 # GET USER NAME with exchanged access token during auth
 def get_user_name(access_token):
     
-    url = 'https://app.asana.com/api/1.0/users/me'
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     payload = {
         'opt_fields': 'name'
     }
     
     try:
-        response = requests.get(url, headers=headers, params=payload)
+        response = asana_get('/users/me', access_token, params=payload)
         response.raise_for_status()
         
         response_json = response.json()
@@ -67,15 +167,12 @@ def get_user_name(access_token):
 #GET USER GID
 def get_user_gid(access_token):
     
-    url = 'https://app.asana.com/api/1.0/users/me'
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
     payload = {
         'opt_fields': 'name'
     }
     
     try:
-        response = requests.get(url, headers=headers, params=payload)
+        response = asana_get('/users/me', access_token, params=payload)
         response.raise_for_status()
         
         response_json = response.json()
@@ -92,24 +189,13 @@ def get_user_gid(access_token):
 # GET PERSONAL TOKEN AND NAME from db 'users'
 def get_user_data(user_gid):
     
-    conn = None
-    cursor = None
-    
     try:
-        conn = mysql.connector.connect(
-            user = db_user,
-            password = db_pass,
-            host = db_host,
-            database = database,
-            charset='utf8mb4'
-            )
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute(
-            "SELECT name, user_token FROM users WHERE user_gid = %s", 
-            (user_gid,)
-            )
-        result = cursor.fetchone()
+        with db_connection() as conn, closing(conn.cursor(dictionary=True)) as cursor:
+            cursor.execute(
+                "SELECT name, user_token FROM users WHERE user_gid = %s", 
+                (user_gid,)
+                )
+            result = cursor.fetchone()
         
         if result:
             return result.get('name'), result.get('user_token')
@@ -120,19 +206,10 @@ def get_user_data(user_gid):
         logging.error(f"DB error: {err} for user: {user_gid}")
         return None, None
         
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
-        
     
 # SAVE EXTRACTED TG and ASANA data to redis cache and table 'bot'
 def save_asana_data(user_name, user_gid, user_token, user_id, tg_user):
     
-    conn = None
-    cursor = None
-    
     try:
         redis_key = f"user_data:{user_id}"
         redis_data = {"user_gid": user_gid, 
@@ -142,29 +219,30 @@ def save_asana_data(user_name, user_gid, user_token, user_id, tg_user):
         
         redis_client.set(redis_key, json.dumps(redis_data, ensure_ascii=False), ex=token_ttl)
         
-        conn = mysql.connector.connect(
-            user=db_user,
-            password=db_pass,
-            host = db_host,
-            database=database,
-            charset='utf8mb4'
-        )
-        cursor = conn.cursor()
-    
-        cursor.execute(
-            """
-            INSERT INTO bot (user_id, tg_user, user_name, user_token, user_gid, date_added)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            tg_user = %s,
-            user_name = %s,
-            user_token = %s,
-            date_added = %s
-            """,
-            (user_id, tg_user, user_name, user_token, user_gid, date.today(),
-            tg_user, user_name, user_token, date.today())
-        )
-        conn.commit()
+        # the bot process holds its own copy of the old token / list
+        invalidate_user_data(user_id)
+        
+        if tg_user:
+            redis_client.hset(tg_users_key, user_name, tg_user)
+        
+        # resolve list gid once at auth, /mytasks reads it from cache
+        get_list_gid(user_id, user_gid, user_token, workspace_gid, refresh=True)
+        
+        with db_connection() as conn, closing(conn.cursor()) as cursor:
+            cursor.execute(
+                """
+                INSERT INTO bot (user_id, tg_user, user_name, user_token, user_gid, date_added)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                tg_user = %s,
+                user_name = %s,
+                user_token = %s,
+                date_added = %s
+                """,
+                (user_id, tg_user, user_name, user_token, user_gid, date.today(),
+                tg_user, user_name, user_token, date.today())
+            )
+            conn.commit()
         
         logger.info(f"Asana data saved for: {user_name}/{user_id}")
         return True
@@ -177,18 +255,14 @@ def save_asana_data(user_name, user_gid, user_token, user_id, tg_user):
         logger.error(f"Redis error: {err} for user: {user_name}/{user_id}")
         return False
     
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
     
-    
-# GET REDIS DATA FROM CACHE
+# GET REDIS DATA FROM CACHE, in-process cache -> redis -> db 'bot'
 def get_redis_data(user_id):
     
-    conn = None
-    cursor = None
+    # repeat lookups are served from process memory without a round trip
+    user_data = user_data_cache.get(str(user_id))
+    if user_data is not None:
+        return user_data
     
     try:
         # checking redis cache
@@ -203,25 +277,20 @@ def get_redis_data(user_id):
             user_token = user_data.get('user_token')
             tg_user = user_data.get('tg_user')
             
+            user_data_cache.set(str(user_id), (user_gid, user_name, user_token, tg_user))
+            
             logger.info(f"user data retrieved from Redis cache for user: {user_name}/{user_id}")
             return user_gid, user_name, user_token, tg_user
         
         # fallback to db 'bot' table
-        conn = mysql.connector.connect(
-            user=db_user,
-            password=db_pass,
-            host = db_host,
-            database=database
-        )
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-                       SELECT tg_user, user_name, user_token, user_gid 
-                       FROM bot 
-                       WHERE user_id = %s
-                       """,
-                       (user_id,))
-        result = cursor.fetchone()
+        with db_connection() as conn, closing(conn.cursor(dictionary=True)) as cursor:
+            cursor.execute("""
+                           SELECT tg_user, user_name, user_token, user_gid 
+                           FROM bot 
+                           WHERE user_id = %s
+                           """,
+                           (user_id,))
+            result = cursor.fetchone()
         
         if result:
             user_gid = result['user_gid']
@@ -231,7 +300,8 @@ def get_redis_data(user_id):
             
             # update redis cache
             redis_data = {"user_gid": user_gid, "tg_user": tg_user, "user_name": user_name, "user_token": user_token}
-            redis_client.set(redis_key, json.dumps(redis_data, ensure_ascii=False))
+            redis_client.set(redis_key, json.dumps(redis_data, ensure_ascii=False), ex=token_ttl)
+            user_data_cache.set(str(user_id), (user_gid, user_name, user_token, tg_user))
             
             logger.info(f"user data retrieved from DB and cached in Redis for user: {user_id}/{user_name}")
             return user_gid, user_name, user_token, tg_user
@@ -246,67 +316,100 @@ def get_redis_data(user_id):
     except redis.exceptions.RedisError as err:
         logger.error(f"Redis error: {err} for user: {user_id}")
         return None, None, None, None
-    
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
             
               
-# EXTRACTING PROJECT NAMES
-def extract_projects(task_gid, user_token):
+# PROJECTS AND PARENT from a task record
+def task_ancestry(data):
+    
+    # project names
+    projects = data.get('projects', [])
+    project_names = [p['name'] for p in projects] if projects else []
+    
+    # parent gid
+    parent = data.get('parent')
+    parent_gid = parent.get('gid') if parent else None
+    
+    return project_names, parent_gid
 
-    while task_gid:
-        
-        # fetch data on a single task
-        url = f'https://app.asana.com/api/1.0/tasks/{task_gid}'
-        headers = {'Authorization': f'Bearer {user_token}'}
-        
-        payload = {
-            'opt_fields': 'projects, projects.name, parent, parent.name'
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, params=payload)
-            response.raise_for_status()
+
+# FETCH PROJECTS AND PARENT for up to 10 tasks in one /batch round trip
+def fetch_ancestry_batch(task_gids, user_token):
+    
+    actions = [(f'/tasks/{gid}', ['projects', 'projects.name', 'parent', 'parent.name']) for gid in task_gids]
+    ancestry = {}
+    
+    for gid, (status_code, data) in zip(task_gids, asana_batch(actions, user_token)):
+        if status_code == 200 and data is not None:
+            ancestry[gid] = task_ancestry(data)
+        else:
+            logging.error(f"error: {status_code} while extracting project names for task: {gid}")
+    
+    return ancestry
+
+
+# RESOLVE PROJECT NAMES for many tasks, climbing parent chains level by level
+def resolve_projects(task_gids, user_token):
+    
+    ancestry = {}  # gid -> (project_names, parent_gid), each gid is fetched once per call
+    failed = set()
+    pending = set(task_gids)
+    
+    with ThreadPoolExecutor(max_workers=asana_workers) as executor:
+        while pending:
+            # cached ancestry first, only misses go to asana
+            cached = get_cached_ancestry(pending)
+            ancestry.update(cached)
             
-            response_json = response.json()
-            data = response_json.get('data', {})
+            # misses are fetched in /batch chunks, chunks run concurrently
+            misses = list(pending - cached.keys())
+            chunks = [misses[i:i + asana_batch_size] for i in range(0, len(misses), asana_batch_size)]
+            futures = {executor.submit(fetch_ancestry_batch, chunk, user_token): chunk for chunk in chunks}
+            fetched = {}
             
-            # project names
-            projects = data.get('projects', [])
-            project_names = [p['name'] for p in projects] if projects else []
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    fetched.update(future.result())
+                except requests.exceptions.RequestException as err:
+                    logging.error(f"network error {err} while extracting project names for tasks: {chunk}")
             
-            # parent gids
-            parent = data.get('parent')
-            parent_gid = parent.get('gid') if parent else None
+            failed.update(gid for gid in misses if gid not in fetched)
             
-            if project_names:
-                return project_names
-            if parent_gid:
-                task_gid = parent_gid
-            else:
-                return []
+            cache_ancestry(fetched)
+            ancestry.update(fetched)
             
-        except requests.exceptions.RequestException as err:
-            logging.error(f"network error {err} while extracting project names for task: {task_gid}")
-            return None
-    return []
-    
-    
-# GET TASKS FROM ASANA + CHECK NOTES FROM DB / extracting tasks for a user from today/сегодня section of mytask list
-def get_tasks(user_id, workspace_gid):
-    
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
-    
-    if user_gid is None or user_token is None:
-        logging.error(f"unable to retrieve Asana creds for user: {user_id}")
-        return pd.DataFrame()
+            parents = set()
+            for gid in pending:
+                project_names, parent_gid = ancestry.get(gid, ([], None))
+                if not project_names and parent_gid:
+                    parents.add(parent_gid)
+            
+            # shared parents go to the next level only once
+            pending = parents - ancestry.keys() - failed
+    
+    # walk the fetched chains: first ancestor with projects wins, None on network error
+    resolved = {}
+    for task_gid in task_gids:
+        gid = task_gid
+        project_names = []
+        
+        while gid:
+            if gid in failed:
+                project_names = None
+                break
+            names, parent_gid = ancestry.get(gid, ([], None))
+            if names:
+                project_names = names
+                break
+            gid = parent_gid
+            
+        resolved[task_gid] = project_names
     
-    # get list from asana
-    url = f"https://app.asana.com/api/1.0/users/{user_gid}/user_task_list"
-    headers = {'Authorization': f'Bearer {user_token}'}
+    return resolved
+
+
+# GET USER TASK LIST GID from asana
+def fetch_list_gid(user_gid, user_token, workspace_gid):
     
     payload = {
         'workspace': workspace_gid,
@@ -315,779 +418,526 @@ def get_tasks(user_id, workspace_gid):
         }
     
     try: 
-        response = requests.get(url, headers=headers, params=payload)
+        response = asana_get(f"/users/{user_gid}/user_task_list", user_token, params=payload)
         response.raise_for_status()
         
         response_json = response.json()
-        list_gid = response_json.get('data',{}).get('gid')
+        return response_json.get('data',{}).get('gid')
     
     except requests.exceptions.RequestException as err:
-        logging.error(f"network errror: {err} trying fetching Asana list_gid for user: {user_name}/{user_id}")
-        return pd.DataFrame()
+        logging.error(f"network errror: {err} trying fetching Asana list_gid for user: {user_gid}")
+        return None
+
+
+# GET LIST GID from redis cache, resolve and cache on miss or when refresh is forced
+def get_list_gid(user_id, user_gid, user_token, workspace_gid, refresh=False):
+    
+    redis_key = f"list_gid:{user_id}"
+    
+    try:
+        if not refresh:
+            list_gid = redis_client.get(redis_key)
+            if list_gid:
+                return list_gid
+    
+        list_gid = fetch_list_gid(user_gid, user_token, workspace_gid)
+        if list_gid:
+            redis_client.set(redis_key, list_gid, ex=token_ttl)
+        return list_gid
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} for list_gid of user: {user_id}")
+        return fetch_list_gid(user_gid, user_token, workspace_gid)
+
+
+def is_today_section(section):
+    return (section.get('name') or '').strip().lower() in today_sections
+
+
+# GET TODAY SECTION GIDS of a user task list from asana
+def fetch_today_sections(list_gid, user_token):
+    
+    payload = {
+        'opt_fields': 'name'
+        }
     
-    # get my tasks for today
-    my_tasks = []
+    try:
+        sections = iter_records(f"/projects/{list_gid}/sections",
+                                user_token,
+                                params=payload,
+                                predicate=is_today_section,
+                                fields=['gid'])
+        return [s['gid'] for s in sections]
+    
+    except requests.exceptions.RequestException as err:
+        logging.error(f"network errror: {err} trying fetching sections of list: {list_gid}")
+        return []
+
+
+# GET TODAY SECTION GIDS from redis cache, resolve and cache on miss or when refresh is forced
+def get_today_sections(user_id, list_gid, user_token, refresh=False):
+    
+    redis_key = f"today_sections:{user_id}"
+    
+    try:
+        if not refresh:
+            cached_sections = redis_client.get(redis_key)
+            if cached_sections:
+                return json.loads(cached_sections)
+        
+        section_gids = fetch_today_sections(list_gid, user_token)
+        if section_gids:
+            redis_client.set(redis_key, json.dumps(section_gids), ex=token_ttl)
+        return section_gids
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} for today sections of user: {user_id}")
+        return fetch_today_sections(list_gid, user_token)
+
+
+# GET ALL PAGES of an asana list endpoint, returns records and the status code
+def fetch_all_pages(url, user_token, payload, predicate=None, fields=None):
+    
+    try:
+        return list(iter_records(url, user_token, params=payload, predicate=predicate, fields=fields)), 200
     
-    url = f"https://app.asana.com/api/1.0/user_task_lists/{list_gid}/tasks"
+    except requests.exceptions.HTTPError as err:
+        return [], err.response.status_code
+    
+    except requests.exceptions.RequestException as err:
+        logging.error(f"network errror: {err} while fetching pages of: {url}")
+        return [], None
+
+
+def in_today_section(task):
+    return is_today_section(task.get('assignee_section') or {})
+
+
+# GET INCOMPLETE TASKS from today sections, whole list as a fallback
+def fetch_today_tasks(list_gid, section_gids, user_token):
     
     payload = {
         'completed_since': 'now',
-        'opt_fields': 'name, due_on, projects, projects.name, section.name, notes, assignee_section.name, permalink_url',
+        'opt_fields': 'name, due_on, projects, projects.name, notes, permalink_url, modified_at',
         'limit': 100,
         'opt_pretty': True  
         }
     
-    # pagination 
-    while True:
-        response = requests.get(url, headers=headers, params=payload)
-        
-        if response.status_code == 200:
-            json_data = response.json()
+    if section_gids:
+        my_tasks = []
+        
+        for section_gid in section_gids:
+            section_tasks, status = fetch_all_pages(f"/sections/{section_gid}/tasks",
+                                                    user_token,
+                                                    payload,
+                                                    fields=task_fields)
+            if status != 200:
+                return my_tasks, status
+            my_tasks.extend(section_tasks)
             
-            if json_data.get('data'): 
-                my_tasks.extend(json_data['data'])
-            
-            # check for more pages presence
-            if json_data.get('next_page'): 
-                payload['offset'] = json_data['next_page']['offset']  # update for next page
-            else:
-                break 
-        else:
-            logging.error(f"error: {response.status_code} while fetching Asana tasks for user: {user_name}/{user_id}")
-            break
-        
-    if my_tasks:
-        my_tasks_df = pd.json_normalize(my_tasks, max_level=3) 
-        
-        my_tasks_df.rename(columns={'gid':'task_gid',
-                                    'name':'task_name',
-                                    'permalink_url':'url',
-                                    'projects':'project_name'}, inplace=True)
+        return my_tasks, 200
     
-        # filter tasks from today sections
-        if 'assignee_section.name' in my_tasks_df.columns:
-            my_tasks_df = my_tasks_df[
-                my_tasks_df['assignee_section.name'].str.lower().isin(['today', 'сегодня', 'фокус'])
-                ]
-          
-        # extracting project names from nested list - if tasks belong to multiple projects
-        def dicts_to_names(x):
-            if isinstance(x, list):
-                return [p.get('name', '') for p in x if 'name' in p]
-            return []
-        
-        if 'project_name' in my_tasks_df.columns:
-            my_tasks_df['project_name'] = my_tasks_df['project_name'].apply(dicts_to_names)
-        
-        # extracting project names from parent tasks
-        for idx, task_row in my_tasks_df.iterrows():
-            proj = task_row['project_name']
-            task_gid = task_row['task_gid']
-            
-            if not proj:
-                project_names = extract_projects(task_gid, user_token)
-                if project_names:
-                    my_tasks_df.at[idx, 'project_name'] = project_names
-
-        logging.info(f"mytasks data retrieved for user: {user_name}")
-    else:
-        my_tasks_df = pd.DataFrame() 
-     
-    return my_tasks_df
+    # no today sections found - stream the whole list, keeping only today tasks
+    payload['opt_fields'] = 'name, due_on, projects, projects.name, notes, assignee_section.name, permalink_url, modified_at'
+    
+    return fetch_all_pages(f"/user_task_lists/{list_gid}/tasks",
+                           user_token,
+                           payload,
+                           predicate=in_today_section,
+                           fields=task_fields)
 
 
-# FORMAT mytasks message
-def format_df(df, extra_note, max_len=None, max_note_len=None):
+# GET TODAY MEMBERSHIP: gid -> modified_at of incomplete today tasks, no task details
+def fetch_today_membership(list_gid, section_gids, user_token):
     
-    current_date = datetime.now().strftime("%d %b %Y · %a")
-    message = f"<b>{current_date}</b>\n\n"
+    payload = {
+        'completed_since': 'now',
+        'opt_fields': 'modified_at',
+        'limit': 100
+        }
     
-    # convert project list to str
-    df['project_name'] = df['project_name'].apply(lambda x: ', '.join(x) if isinstance(x, list) else x)
-                                                  
-    # group tasks by project_name 
-    grouped_tasks = df.groupby('project_name')
+    membership = {}
     
-    for project, group in grouped_tasks:
-        if isinstance(project, list):
-            project_name = ', '.join(project)  
-        else:
-            project_name = project if project else 'No project'
- 
-        project_escaped = html.escape(project_name)
-        message += f"━\n<b>{project_escaped}</b>\n"
-
-        # sort tasks by due date
-        sorted_group = sorted(
-            group.itertuples(),
-            key=lambda row: datetime.strptime(row.due_on, '%Y-%m-%d') if row.due_on else datetime.max
-        )
-        
-        for idx, row in enumerate(sorted_group, start=1):
-            
-            # escape all fields to avoid HTML issues
-            task_escaped = html.escape(row.task_name)
-            url_escaped = html.escape(row.url)
-            notes = html.escape(row.notes) if row.notes else '-' 
-            #notes = html.escape(getattr(row, 'notes', '-')) if hasattr(row, 'notes') else '-'
-            due = html.escape(row.due_on) if row.due_on else 'No DL'
-
-            # format due date if available
-            if due != 'No DL':
-                due_date = datetime.strptime(due, '%Y-%m-%d')
-                due = due_date.strftime("%d-%m-%Y")
-
-            # truncate notes if necessary
-            if max_note_len and len(notes) > max_note_len:
-                notes = notes[:max_note_len - 3].rstrip() + " (...)"
-
-            task_entry = f'{idx}. <a href="{url_escaped}">{task_escaped}</a> · <code>{due}</code>\n{notes}\n\n'
-            message += task_entry
-
-        message += "\n"
-
-    # truncate final message carefully if needed
-    if max_len and len(message) > max_len:
-        safe_cut = message.rfind('</a>', 0, max_len)
+    if section_gids:
+        for section_gid in section_gids:
+            section_tasks, status = fetch_all_pages(f"/sections/{section_gid}/tasks",
+                                                    user_token,
+                                                    payload,
+                                                    fields=['gid', 'modified_at'])
+            if status != 200:
+                return membership, status
+            membership.update((task['gid'], task['modified_at']) for task in section_tasks)
         
-        if safe_cut != -1:
-            message = message[:safe_cut+4] + " (...)"
-        else:
-            message = message[:max_len].rstrip() + " (...)"
+        return membership, 200
+    
+    payload['opt_fields'] = 'modified_at, assignee_section.name'
+    
+    my_tasks, status = fetch_all_pages(f"/user_task_lists/{list_gid}/tasks",
+                                       user_token,
+                                       payload,
+                                       predicate=in_today_section,
+                                       fields=['gid', 'modified_at'])
+    membership.update((task['gid'], task['modified_at']) for task in my_tasks)
+    
+    return membership, status
+
 
-    # handle extra note if provided
-    if extra_note:
-        extra_escaped = html.escape(extra_note)
-        if max_note_len and len(extra_escaped) > max_note_len:
-            extra_escaped = extra_escaped[:max_note_len - 3].rstrip() + " (...)"
-        message += f"<b>✲ Note:</b>\n{extra_escaped}\n\n"
+# TASK RECORD as kept in the task store, projects as a list of names
+def store_record(task):
+    
+    record = project_fields(task, task_fields)
+    record['projects'] = [p.get('name', '') for p in record['projects'] or [] if 'name' in p]
     
-    return message
+    return record
 
 
-# CHECK NOTES from 'notes' bd
-def get_note(user_id):
+# RESOLVE project names of project-less records from their parent tasks
+def resolve_record_projects(records, user_token):
     
-    conn = None
-    cursor = None
+    no_project = [gid for gid, record in records.items() if not record['projects']]
     
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    if no_project:
+        resolved = resolve_projects(no_project, user_token)
+        for gid in no_project:
+            records[gid]['projects'] = resolved.get(gid) or []
     
-    if user_name is None:
-        logging.error(f"unable to retrieve Asana creds for user: {user_id}")
-        return None
+    return records
+
+
+# FETCH FULL RECORDS of new / modified tasks via /batch, tasks gone since the listing are left out
+def fetch_task_records(task_gids, user_token):
     
-    try:
-        conn = mysql.connector.connect(
-            user=db_user,
-            password=db_pass,
-            host = db_host,
-            database=database
-        )
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute(
-            """
-            SELECT note
-            FROM notes
-            WHERE user_name = %s AND date_added = %s
-            """,
-            (user_name, date.today())
-        )
-        
-        result = cursor.fetchone()
-        
-        if result:
-            extra_note = result['note']
-            return extra_note
-        return None
-        
-    except mysql.connector.Error as err:
-        logger.error(f"DB error: {err}")
-        return None
+    actions = [(f"/tasks/{gid}", task_fields + ['projects.name']) for gid in task_gids]
+    records = {}
     
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
+    for gid, (status, data) in zip(task_gids, asana_batch(actions, user_token)):
+        if status == 200 and data:
+            records[gid] = store_record(data)
     
+    return resolve_record_projects(records, user_token)
 
-# ADD NOTE to DB 'notes'
-def store_note(note, user_id):
-    
-    conn = None
-    cursor = None
+
+# SYNC TODAY TASKS of a user through the task store, returns records in list order and the status code
+# a full fetch seeds the store, later syncs list gid + modified_at only and fetch changed tasks in full,
+# while a webhook pushes the user's changes a fresh store is served as is
+def sync_today_tasks(user_id, list_gid, section_gids, user_token):
     
-    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    scope = {"list_gid": list_gid, "sections": section_gids}
+    stored, meta = load_task_store(user_id)
+    push = bool(meta and meta.get('push'))
+    generation = meta.get('generation') if meta else None
     
-    if user_name is None:
-        logging.error(f"unable to retrieve Asana creds for user: {user_id}")
-        return False
+    # seeded stores are told apart by their meta, a user with no today tasks has an empty store
+    if meta is not None and meta.get('scope') == scope and meta.get('fresh'):
+        return [stored[gid] for gid in meta.get('order', []) if gid in stored], 200
     
-    try:
-        conn = mysql.connector.connect(
-            user=db_user,
-            password=db_pass,
-            host = db_host,
-            database=database
-        )
-        cursor = conn.cursor()
+    if meta is None or meta.get('scope') != scope:
+        my_tasks, status = fetch_today_tasks(list_gid, section_gids, user_token)
+        if status != 200:
+            return [], status
         
-        cursor.execute(
-            """
-            INSERT INTO notes (user_name, note, date_added)
-            VALUES (%s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            note = VALUES(note), date_added = VALUES(date_added)
-            """,
-            (user_name, note, date.today())
-        )
-        conn.commit()
+        records = resolve_record_projects({task['gid']: store_record(task) for task in my_tasks}, user_token)
+        sync_meta = {"scope": scope, "order": list(records), "synced_at": datetime.now().isoformat()}
+        write_task_store(user_id, records, [], sync_meta, replace=True, push=push, generation=generation)
         
-        logger.info(f"note {note} saved for: {user_name}/{user_id}")
-        return True
-        
-    except mysql.connector.Error as err:
-        logger.error(f"DB error: {err}")
-        return False
-        
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
-        
-         
-# GET TASKS FROM DB + CHECK NOTES for additions
-def get_report(user_name, pm_users, ba_users, av_users):
+        logger.info(f"task store seeded for user: {user_id}, {len(records)} tasks")
+        return list(records.values()), 200
     
-    skip_users = pm_users + ba_users + av_users
-    skip_users = [user.lower() for user in skip_users]
+    membership, status = fetch_today_membership(list_gid, section_gids, user_token)
+    if status != 200:
+        return [], status
     
-    logger.info(f"request for general report by {user_name}")
-    
-    conn = None
+    changed = [
+        gid for gid, modified_at in membership.items()
+        if gid not in stored or stored[gid].get('modified_at') != modified_at
+    ]
     
     try:
-        conn = mysql.connector.connect(
-            user=db_user,
-            password=db_pass,
-            host=db_host,
-            database=database
-        )
-        
-        # fetching tasks
-        tasks_query = """
-            SELECT project_name, user_name, task_name, due_on, notes, url
-            FROM tasks
-            WHERE date_extracted = %s
-        """
-        params = (date.today(),)
-        tasks_df = pd.read_sql(tasks_query, conn, params=params)
-        
-        # convert due_on format to dd-mm-YYYY / No DL
-        tasks_df['due_on'] = pd.to_datetime(tasks_df['due_on'], errors='coerce').dt.date
-        tasks_df['due_on'] = tasks_df['due_on'].apply(
-            lambda x: x.strftime("%d-%m-%Y") if pd.notnull(x) else "No DL"
-        )
-
-        # fetching notes
-        notes_query = """
-            SELECT user_name, note
-            FROM notes
-            WHERE date_added = %s
-        """
-        notes_df = pd.read_sql(notes_query, conn, params=params)
-        
-        # normalize project names
-        if not tasks_df.empty and 'project_name' in tasks_df.columns:
-            tasks_df['project_name'] = (
-                tasks_df['project_name']
-                .fillna('')  # replace NaN with empty str
-                .astype(str) # ensure str
-                .str.strip() # strip whitespace
-            )
-            tasks_df.loc[tasks_df['project_name'] == '', 'project_name'] = 'No project'
+        fetched = fetch_task_records(changed, user_token) if changed else {}
+    except requests.exceptions.HTTPError as err:
+        return [], err.response.status_code
+    except requests.exceptions.RequestException as err:
+        logging.error(f"network errror: {err} while fetching changed tasks of user: {user_id}")
+        return [], None
+    
+    # left the today sections / completed, or deleted between the listing and the batch
+    removed = [gid for gid in stored if gid not in membership or gid in changed and gid not in fetched]
+    records = {**stored, **fetched}
+    
+    for gid in removed:
+        records.pop(gid)
+    
+    order = [gid for gid in membership if gid in records]
+    sync_meta = {"scope": scope, "order": order, "synced_at": datetime.now().isoformat()}
+    write_task_store(user_id, fetched, removed, sync_meta, push=push, generation=generation)
+    
+    logger.info(f"task store synced for user: {user_id}, {len(fetched)} changed, {len(removed)} removed")
+    return [records[gid] for gid in order], 200
+
+
+# GET TASKS FROM ASANA + CHECK NOTES FROM DB / extracting tasks for a user from today/сегодня section of mytask list
+# user_context from get_user_context saves the creds / list gid lookups
+def get_tasks(user_id, workspace_gid, user_context=None):
+    
+    if user_context is not None:
+        user_gid, user_name, user_token = user_context['user_gid'], user_context['user_name'], user_context['user_token']
+    else:
+        user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    
+    if user_gid is None or user_token is None:
+        logging.error(f"unable to retrieve Asana creds for user: {user_id}")
+        return pd.DataFrame()
+    
+    # get list gid, cached per user
+    list_gid = user_context.get('list_gid') if user_context else None
+    if list_gid is None:
+        list_gid = get_list_gid(user_id, user_gid, user_token, workspace_gid)
+    
+    if list_gid is None:
+        logging.error(f"unable to retrieve Asana list_gid for user: {user_name}/{user_id}")
+        return pd.DataFrame()
+    
+    # get my tasks for today, only from today sections when the list has them
+    # synced through the task store, only new / modified tasks are fetched in full
+    section_gids = get_today_sections(user_id, list_gid, user_token)
+    my_tasks, status = sync_today_tasks(user_id, list_gid, section_gids, user_token)
+    
+    if status == 404:
+        # cached list / section gids are stale, resolve them again
+        logging.info(f"stale list_gid {list_gid} for user: {user_name}/{user_id}, refreshing")
+        list_gid = get_list_gid(user_id, user_gid, user_token, workspace_gid, refresh=True)
         
-        # building tasks_dict with tasks_df of each user
-        tasks_dict = {}
+        if list_gid is not None:
+            section_gids = get_today_sections(user_id, list_gid, user_token, refresh=True)
+            my_tasks, status = sync_today_tasks(user_id, list_gid, section_gids, user_token)
+    
+    if status != 200:
+        # retries are exhausted, don't show a partial list as the plan for the day
+        logging.error(f"error: {status} while fetching Asana tasks for user: {user_name}/{user_id}")
+        return pd.DataFrame()
         
-        if tasks_df is not None and not tasks_df.empty and notes_df is not None:
-            users = tasks_df['user_name'].unique().tolist()
-            
-            for user in users:
-                user_lower = user.lower()
-                
-                if user_lower in skip_users:
-                    logger.info(f"general report, skipping user: {user}")
-                    continue 
-                
-                # filter tasks and notes for the user
-                user_tasks = tasks_df[tasks_df['user_name'] == user].copy()
-                user_notes = notes_df[notes_df['user_name'] == user] if not notes_df.empty else None
-                
-                # merge notes into user_tasks as 'extra_note'
-                if user_notes is not None and not user_notes.empty:
-                    note_value = user_notes['note'].iloc[0]
-                    user_tasks.loc[:, 'extra_note'] = note_value
-                else:
-                    user_tasks.loc[:, 'extra_note'] = None
-
-                tasks_dict[user] = user_tasks.reset_index(drop=True)
+    if my_tasks:
+        # records come with project names, resolved from parent tasks for project-less tasks
+        my_tasks_df = pd.DataFrame(my_tasks).drop(columns=['modified_at'])
         
-        return tasks_dict
+        my_tasks_df.rename(columns={'gid':'task_gid',
+                                    'name':'task_name',
+                                    'permalink_url':'url',
+                                    'projects':'project_name'}, inplace=True)
 
-    except mysql.connector.Error as err:
-        logger.error(f"DB error: {err}")
-        return None
-    
-    finally:
-        if conn is not None:
-            conn.close()
+        logging.info(f"mytasks data retrieved for user: {user_name}")
+    else:
+        my_tasks_df = pd.DataFrame() 
+     
+    return my_tasks_df
 
 
+# cached note of the day, '' when the user has no note
+def note_key(user_id, day):
+    return f"note:{user_id}:{day.isoformat()}"
 
-# REPORT FOR PM
-def get_report_pm(user_name, pm_users):
-    
-    if not pm_users:
-        logger.info("PM users list is empty")
-        return None
+
+# GET NOTE of the day from DB 'notes' and cache it
+def fetch_note(user_id, user_name, day):
     
-    logger.info(f"request for PM report by {user_name}")    
-        
-    conn = None
-        
     try:
-        conn = mysql.connector.connect(
-        user=db_user,
-        password=db_pass,
-        host = db_host,
-        database=database
-        )
-        
-        pm_user_names = ', '.join(['%s'] * len(pm_users))
-        
-        # tasks data
-        tasks_query = (
-            f"""
-            SELECT project_name, user_name, task_name, due_on, notes, url
-            FROM tasks 
-            WHERE date_extracted = %s
-            AND user_name IN ({pm_user_names})
-            """
-            )
-        params = (date.today(),) + tuple(pm_users)
-        tasks_df = pd.read_sql(tasks_query, conn, params=params)
-        
-        # convert due_on format to dd-mm-YYYY / No DL
-        tasks_df['due_on'] = pd.to_datetime(tasks_df['due_on'], errors='coerce').dt.date
-        tasks_df['due_on'] = tasks_df['due_on'].apply(
-            lambda x: x.strftime("%d-%m-%Y") if pd.notnull(x) else "No DL"
-        )
-        
-        # notes data
-        notes_query = (
-            f"""
-            SELECT user_name, note
-            FROM notes
-            WHERE date_added = %s
-            AND user_name IN ({pm_user_names})
-            """
+        with db_connection() as conn, closing(conn.cursor(dictionary=True)) as cursor:
+            cursor.execute(
+                """
+                SELECT note
+                FROM notes
+                WHERE user_name = %s AND date_added = %s
+                """,
+                (user_name, day)
             )
-        notes_df = pd.read_sql(notes_query, conn, params=params)
-        
-        # normalize project names
-        if not tasks_df.empty and 'project_name' in tasks_df.columns:
-            tasks_df['project_name'] = (
-                tasks_df['project_name']
-                .fillna('')  # replace NaN with empty str
-                .astype(str) # ensure str
-                .str.strip() # strip whitespace
-            )
-            tasks_df.loc[tasks_df['project_name'] == '', 'project_name'] = 'No project'
-        
-           
-        # build tasks_dict
-        tasks_dict = {}
-        
-        if tasks_df is not None and not tasks_df.empty and notes_df is not None:
-            users = tasks_df['user_name'].unique().tolist()
-            
-            for user in users:
-                user_tasks = tasks_df[tasks_df['user_name'] == user]
-                user_notes = notes_df[notes_df['user_name'] == user] if not notes_df.empty else None
-                
-                # merge notes into user_tasks as 'extra_note'
-                if user_notes is not None and not user_notes.empty:
-                    note_value = user_notes['note'].iloc[0]
-                    user_tasks.loc[:, 'extra_note'] = note_value
-                else:
-                    user_tasks = user_tasks.copy()
-                    user_tasks.loc[:, 'extra_note'] = None
-                    
-                tasks_dict[user] = user_tasks.reset_index(drop=True)      
-                
-        return tasks_dict
             
+            result = cursor.fetchone()
+        
     except mysql.connector.Error as err:
         logger.error(f"DB error: {err}")
         return None
     
-    finally:
-        if conn is not None:
-            conn.close()
+    extra_note = result['note'] if result else None
+    
+    try:
+        redis_client.set(note_key(user_id, day), extra_note or '', ex=note_ttl)
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while caching note of user: {user_id}")
+    
+    return extra_note
 
 
-# REPORT FOR BA
-def get_report_ba(user_name, ba_users):
+# GET USER CONTEXT for a command: creds, today's note and list gid in one pipelined redis call
+# misses fall back to DB 'bot' / 'notes', a missing list gid is resolved later by get_tasks
+def get_user_context(user_id):
     
-    if not ba_users:
-        logger.info("BA users list is empty")
-        return None
+    day = date.today()
+    
+    # creds cached in process memory aren't fetched again
+    user_data = user_data_cache.get(str(user_id))
     
-    logger.info(f"request for BA report by {user_name}")    
-        
-    conn = None
-        
     try:
-        conn = mysql.connector.connect(
-        user=db_user,
-        password=db_pass,
-        host = db_host,
-        database=database
-        )
-        
-        ba_user_names = ', '.join(['%s'] * len(ba_users))
-        
-        # tasks data
-        tasks_query = (
-            f"""
-            SELECT project_name, user_name, task_name, due_on, notes, url
-            FROM tasks 
-            WHERE date_extracted = %s
-            AND user_name IN ({ba_user_names})
-            """
-            )
-        params = (date.today(),) + tuple(ba_users)
-        tasks_df = pd.read_sql(tasks_query, conn, params=params)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(note_key(user_id, day))
+        pipe.get(f"list_gid:{user_id}")
         
-        # convert due_on format to dd-mm-YYYY / No DL
-        tasks_df['due_on'] = pd.to_datetime(tasks_df['due_on'], errors='coerce').dt.date
-        tasks_df['due_on'] = tasks_df['due_on'].apply(
-            lambda x: x.strftime("%d-%m-%Y") if pd.notnull(x) else "No DL"
-        )
+        if user_data is None:
+            pipe.get(f"user_data:{user_id}")
         
-        # notes data
-        notes_query = (
-            f"""
-            SELECT user_name, note
-            FROM notes
-            WHERE date_added = %s
-            AND user_name IN ({ba_user_names})
-            """
-            )
-        notes_df = pd.read_sql(notes_query, conn, params=params)
-        
-        # normalize project names
-        if not tasks_df.empty and 'project_name' in tasks_df.columns:
-            tasks_df['project_name'] = (
-                tasks_df['project_name']
-                .fillna('')  # replace NaN with empty str
-                .astype(str) # ensure str
-                .str.strip() # strip whitespace
-            )
-            tasks_df.loc[tasks_df['project_name'] == '', 'project_name'] = 'No project'
-        
-        # build tasks_dict
-        tasks_dict = {}
-        
-        if tasks_df is not None and not tasks_df.empty and notes_df is not None:
-            users = tasks_df['user_name'].unique().tolist()
-            
-            for user in users:
-                user_tasks = tasks_df[tasks_df['user_name'] == user]
-                user_notes = notes_df[notes_df['user_name'] == user] if not notes_df.empty else None
-                
-                # merge notes into user_tasks as 'extra_note'
-                if user_notes is not None and not user_notes.empty:
-                    note_value = user_notes['note'].iloc[0]
-                    user_tasks.loc[:, 'extra_note'] = note_value
-                else:
-                    user_tasks = user_tasks.copy()
-                    user_tasks.loc[:, 'extra_note'] = None
-                    
-                tasks_dict[user] = user_tasks.reset_index(drop=True)      
-                
-        return tasks_dict
-            
-    except mysql.connector.Error as err:
-        logger.error(f"DB error: {err}")
+        cached = pipe.execute()
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while fetching context of user: {user_id}")
+        cached = [None, None, None]
+    
+    extra_note, list_gid = cached[0], cached[1]
+    
+    if user_data is None and len(cached) > 2 and cached[2]:
+        redis_data = json.loads(cached[2])
+        user_data = (redis_data.get('user_gid'),
+                     redis_data.get('user_name'),
+                     redis_data.get('user_token'),
+                     redis_data.get('tg_user'))
+        user_data_cache.set(str(user_id), user_data)
+    
+    if user_data is None:
+        user_data = get_redis_data(user_id)
+    
+    user_gid, user_name, user_token, tg_user = user_data
+    
+    if user_name is None:
+        logging.error(f"unable to retrieve Asana creds for user: {user_id}")
         return None
     
-    finally:
-        if conn is not None:
-            conn.close()
+    if extra_note is None:
+        extra_note = fetch_note(user_id, user_name, day)
+    
+    return {
+        "user_gid": user_gid,
+        "user_name": user_name,
+        "user_token": user_token,
+        "tg_user": tg_user,
+        "note": extra_note or None,
+        "list_gid": list_gid
+    }
+    
 
-# REPORT for AV
-def get_report_av(user_name, av_users):
+# ADD NOTE to DB 'notes'
+def store_note(note, user_id):
     
-    if not av_users:
-        logger.info("AV users list is empty")
-        return None
+    user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+    
+    if user_name is None:
+        logging.error(f"unable to retrieve Asana creds for user: {user_id}")
+        return False
     
-    logger.info(f"request for AV report by {user_name}")    
-        
-    conn = None
-        
     try:
-        conn = mysql.connector.connect(
-        user=db_user,
-        password=db_pass,
-        host = db_host,
-        database=database
-        )
-        
-        av_user_names = ', '.join(['%s'] * len(av_users))
-        
-        # tasks data
-        tasks_query = (
-            f"""
-            SELECT project_name, user_name, task_name, due_on, notes, url
-            FROM tasks 
-            WHERE date_extracted = %s
-            AND user_name IN ({av_user_names})
-            """
+        with db_connection() as conn, closing(conn.cursor()) as cursor:
+            cursor.execute(
+                """
+                INSERT INTO notes (user_name, note, date_added)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                note = VALUES(note), date_added = VALUES(date_added)
+                """,
+                (user_name, note, date.today())
             )
-        params = (date.today(),) + tuple(av_users)
-        tasks_df = pd.read_sql(tasks_query, conn, params=params)
+            conn.commit()
         
-        # convert due_on format to dd-mm-YYYY / No DL
-        tasks_df['due_on'] = pd.to_datetime(tasks_df['due_on'], errors='coerce').dt.date
-        tasks_df['due_on'] = tasks_df['due_on'].apply(
-            lambda x: x.strftime("%d-%m-%Y") if pd.notnull(x) else "No DL"
-        )
+        # notes are part of the daily report
+        invalidate_report_snapshot()
         
-        # notes data
-        notes_query = (
-            f"""
-            SELECT user_name, note
-            FROM notes
-            WHERE date_added = %s
-            AND user_name IN ({av_user_names})
-            """
-            )
-        notes_df = pd.read_sql(notes_query, conn, params=params)
-        
-        # normalize project names
-        if not tasks_df.empty and 'project_name' in tasks_df.columns:
-            tasks_df['project_name'] = (
-                tasks_df['project_name']
-                .fillna('')  # replace NaN with empty str
-                .astype(str) # ensure str
-                .str.strip() # strip whitespace
-            )
-            tasks_df.loc[tasks_df['project_name'] == '', 'project_name'] = 'No project'
+        try:
+            redis_client.set(note_key(user_id, date.today()), note, ex=note_ttl)
+        except redis.exceptions.RedisError as err:
+            logger.error(f"Redis error: {err} while caching note of user: {user_id}")
         
-        # build tasks_dict
-        tasks_dict = {}
+        logger.info(f"note {note} saved for: {user_name}/{user_id}")
+        return True
         
-        if tasks_df is not None and not tasks_df.empty and notes_df is not None:
-            users = tasks_df['user_name'].unique().tolist()
-            
-            for user in users:
-                user_tasks = tasks_df[tasks_df['user_name'] == user]
-                user_notes = notes_df[notes_df['user_name'] == user] if not notes_df.empty else None
-                
-                # merge notes into user_tasks as 'extra_note'
-                if user_notes is not None and not user_notes.empty:
-                    note_value = user_notes['note'].iloc[0]
-                    user_tasks.loc[:, 'extra_note'] = note_value
-                else:
-                    user_tasks = user_tasks.copy()
-                    user_tasks.loc[:, 'extra_note'] = None
-                    
-                tasks_dict[user] = user_tasks.reset_index(drop=True)      
-                
-        return tasks_dict
-            
     except mysql.connector.Error as err:
         logger.error(f"DB error: {err}")
-        return None
-    
-    finally:
-        if conn is not None:
-            conn.close()
-
-# FORMAT report messages 
-def format_report(user_df, user, tg_user_name, max_len=None, max_note_len=None):
-    
-    current_date = datetime.now().strftime("%d %b %Y · %a")
-
-    if tg_user_name:
-        message = f"<b>{user}</b> @{tg_user_name}\n{current_date}\n\n"
-    else:
-        message = f"<b>{user}</b>\n{current_date}\n\n"
-
-    grouped_tasks = user_df.groupby('project_name')  # group tasks by project
-
-    for project, group in grouped_tasks:
-        project_name = project  
-        message += f"━\n<b>{project_name}</b>\n"
-        
-        # sort tasks on due date
-        def parse_due(x):
-            try:
-                return datetime.strptime(x, '%d-%m-%Y')
-            except ValueError:
-                # 'No DL' or invalid => treat as something far in the future
-                return datetime.max
-
-        sorted_group = sorted(group.itertuples(), key=lambda row: parse_due(row.due_on))
-
-        # reset idx, enumerate from 1
-        for idx, row in enumerate(sorted_group, start=1):
-            task = row.task_name
-            url = row.url
-            notes = row.notes if row.notes else '-'  
-            due = row.due_on if row.due_on else 'No DL'
-
-            # crop notes if they exceed length limit
-            if max_note_len and len(notes) > max_note_len:
-                notes = notes[:max_note_len - 3].rstrip() + " (...)"
-
-            # escape characters for HTML formatting
-            task_escaped = (task.replace("<", "&lt;")
-                                 .replace(">", "&gt;")
-                                 .replace("&", "&amp;"))
-            url_escaped = (url.replace("<", "&lt;")
-                               .replace(">", "&gt;")
-                               .replace("&", "&amp;"))
-
-            task_entry = f"{idx}. <a href='{url_escaped}'>{task_escaped}</a> · <code>{due}</code>\n{notes}\n\n"
-            message += task_entry
-
-        message += "\n"
-
-    # crop the whole message if it exceeds max_len
-    if max_len and len(message) > max_len:
-        message = message[:max_len].rstrip() + " (...)"
-
-    # handle extra notes
-    if 'extra_note' in user_df.columns:
-        first_note = user_df['extra_note'].dropna()
+        return False
         
-        if not first_note.empty:
-            extra_note = first_note.iloc[0]
-            
-            # crop note if needed
-            if max_note_len and len(extra_note) > max_note_len:
-                extra_note = extra_note[:max_note_len - 3].rstrip() + " (...)"
-            message += f"<b>✲ Note:</b>\n{extra_note}\n\n"
-
-    return message
-
-
-# FORMAT report for AV
-def format_report_av(user_df, user, tg_user_name, max_len=None, max_note_len=None):
-    def esc(text):
-        return html.escape(text, quote=False)
-
-    now = datetime.now().strftime("%d %b %Y · %a")
-    if tg_user_name:
-        header = f"<b>{esc(user)}</b> @{esc(tg_user_name)}\n{now}\n\n"
-    else:
-        header = f"<b>{esc(user)}</b>\n{now}\n\n"
+         
+# redis hash user_name -> tg_user, loaded from 'bot' at startup and kept in sync by save_asana_data
+tg_users_key = "tg_users"
 
-    segments = [header]
-    trailer = " (...)"
 
-    # sort tasks on due date
-    def parse_due(x):
-        try:
-            return datetime.strptime(x, "%d-%m-%Y")
-        except:
-            return datetime.max
-
-    groups = list(user_df.groupby('project_name'))
-    normal_groups = [(p, g) for p, g in groups if p != 'No project']
-    no_project_groups = [(p, g) for p, g in groups if p == 'No project']
-    normal_groups.sort(key=lambda x: x[0] or '')
-    ordered_groups = normal_groups + no_project_groups
-
-    for project, group in ordered_groups:  # group tasks by project
-        seg = f"━\n<b>{esc(project)}</b>\n"
-        tasks = sorted(group.itertuples(), key=lambda row: parse_due(row.due_on))
-        for idx, row in enumerate(tasks, start=1):  # reset idx, enumerate from 1
-            seg += (
-                f"{idx}. <a href=\"{esc(row.url)}\">{esc(row.task_name)}</a>"
-                f" · <code>{esc(row.due_on or 'No DL')}</code>\n\n"
+# LOAD all tg users from 'bot' into the redis index
+def load_tg_users():
+    
+    try:
+        with db_connection() as conn, closing(conn.cursor()) as cursor:
+            cursor.execute(
+                """
+                SELECT user_name, MAX(tg_user)
+                FROM bot
+                WHERE user_name IS NOT NULL AND tg_user IS NOT NULL
+                GROUP BY user_name
+                """
             )
-        segments.append(seg)
-
-    # handle extra notes
-    if 'extra_note' in user_df.columns:
-        extras = user_df['extra_note'].dropna()
-        if not extras.empty:
-            note = extras.iloc[0]
-            if max_note_len and len(note) > max_note_len:  # crop note if needed
-                note = note[:max_note_len - 3].rstrip() + " (...)"
-            segments.append(f"<b>✲ Note:</b>\n{esc(note)}\n\n")
-
-    messages = []
-    current = ""
-    for seg in segments:
-        if max_len and len(current) + len(seg) > max_len:
-            messages.append(current.rstrip())
-            current = seg
-        else:
-            current += seg
-    if current:
-        messages.append(current.rstrip())
-
-    return messages
+            tg_users = dict(cursor.fetchall())
+        
+        pipe = redis_client.pipeline()
+        pipe.delete(tg_users_key)
+        if tg_users:
+            pipe.hset(tg_users_key, mapping=tg_users)
+        pipe.execute()
+        
+        logger.info(f"tg users index loaded: {len(tg_users)} users")
+        return len(tg_users)
+        
+    except mysql.connector.Error as err:
+        logger.error(f"DB error: {err} while loading tg users")
+        return 0
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while loading tg users")
+        return 0
 
 
-#GET TG USER
-def get_tg_user(user_name):
+# GET TG USERS of many users with one HMGET, names missing in the index are looked up in 'bot' at once
+def get_tg_users(user_names):
+    
+    user_names = list(dict.fromkeys(user_names))
     
-    conn = None
-    cursor = None
+    if not user_names:
+        return {}
     
     try:
-        conn = mysql.connector.connect(
-        user=db_user,
-        password=db_pass,
-        host = db_host,
-        database=database
-        )
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute(
-            """
-            SELECT tg_user
-            FROM bot
-            WHERE user_name = %s 
-            LIMIT 1
-            """,
-            (user_name,)
-        )
-        
-        result = cursor.fetchone()
-        
-        if result:
-            tg_user_name = result['tg_user']
-            return tg_user_name
-        return None
+        tg_users = dict(zip(user_names, redis_client.hmget(tg_users_key, user_names)))
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while reading tg users")
+        tg_users = dict.fromkeys(user_names)
+    
+    missing = [user_name for user_name, tg_user in tg_users.items() if tg_user is None]
+    
+    if missing:
+        try:
+            with db_connection() as conn, closing(conn.cursor()) as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT user_name, MAX(tg_user)
+                    FROM bot
+                    WHERE user_name IN ({', '.join(['%s'] * len(missing))}) AND tg_user IS NOT NULL
+                    GROUP BY user_name
+                    """,
+                    tuple(missing)
+                )
+                found = dict(cursor.fetchall())
+            
+        except mysql.connector.Error as err:
+            logger.error(f"DB error: {err}")
+            found = {}
         
-    except mysql.connector.Error as err:
-        logger.error(f"DB error: {err}")
-        return None
+        if found:
+            tg_users.update(found)
+            
+            try:
+                redis_client.hset(tg_users_key, mapping=found)
+            except redis.exceptions.RedisError as err:
+                logger.error(f"Redis error: {err} while caching tg users")
     
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conn is not None:
-            conn.close()
\ No newline at end of file
+    return tg_users
+
@@ -0,0 +1,79 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from config.load_env import async_workers
+
+from services.oauth_service import store_oauth_data
+from services.asana_data import (get_redis_data,
+                                 get_user_context,
+                                 get_tasks,
+                                 store_note,
+                                 load_tg_users,
+                                 listen_user_data_invalidation,
+                                 refresh_team_members,
+                                 is_team_member)
+from services.report_engine import get_group_messages
+from services.report_routes import build_outbox
+from services.extractor import extract_daily_tasks
+
+# blocking asana / mysql / redis calls run here, so one slow call doesn't stall the bot's event loop
+services_executor = ThreadPoolExecutor(max_workers=async_workers, thread_name_prefix="services")
+
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(services_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    services_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ASYNC VARIANTS of the services used by the bot handlers
+async def store_oauth_data_async(user_id, tg_user, state):
+    return await run_blocking(store_oauth_data, user_id, tg_user, state)
+
+
+async def get_redis_data_async(user_id):
+    return await run_blocking(get_redis_data, user_id)
+
+
+async def get_user_context_async(user_id):
+    return await run_blocking(get_user_context, user_id)
+
+
+async def get_tasks_async(user_id, workspace_gid, user_context=None):
+    return await run_blocking(get_tasks, user_id, workspace_gid, user_context=user_context)
+
+
+async def store_note_async(note, user_id):
+    return await run_blocking(store_note, note, user_id)
+
+
+async def refresh_team_members_async(asana_token, team_gid):
+    return await run_blocking(refresh_team_members, asana_token, team_gid)
+
+
+async def is_team_member_async(user_gid, asana_token, team_gid):
+    return await run_blocking(is_team_member, user_gid, asana_token, team_gid)
+
+
+async def load_tg_users_async():
+    return await run_blocking(load_tg_users)
+
+
+async def listen_user_data_invalidation_async():
+    return await run_blocking(listen_user_data_invalidation)
+
+
+async def get_group_messages_async(group, fmt='report', user_name=None):
+    return await run_blocking(get_group_messages, group, fmt=fmt, user_name=user_name)
+
+
+async def build_outbox_async(routes):
+    return await run_blocking(build_outbox, routes)
+
+
+async def extract_daily_tasks_async():
+    return await run_blocking(extract_daily_tasks)
@@ -0,0 +1,75 @@
+import time
+import threading
+import mysql.connector
+import mysql.connector.pooling
+from contextlib import contextmanager
+
+from config.load_env import db_user, db_host, db_pass, database, db_pool_size, db_pool_timeout
+
+import logging
+logger = logging.getLogger(__name__)
+
+db_pool = None
+pool_lock = threading.Lock()
+
+
+# process-wide pool, created on first use so imports don't need a live DB
+def get_db_pool():
+    global db_pool
+    
+    with pool_lock:
+        if db_pool is None:
+            db_pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name="arska_pool",
+                pool_size=db_pool_size,
+                pool_reset_session=True,
+                user=db_user,
+                password=db_pass,
+                host=db_host,
+                database=database,
+                charset='utf8mb4'
+            )
+        return db_pool
+
+
+# CHECKOUT a validated connection, waits for a free one up to db_pool_timeout
+def get_db_connection():
+    
+    pool = get_db_pool()
+    deadline = time.monotonic() + db_pool_timeout
+    
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    
+    # validate, reconnect stale connections (server wait_timeout etc.)
+    try:
+        conn.ping(reconnect=True, attempts=1, delay=0)
+    except mysql.connector.Error:
+        conn.close()
+        raise
+    
+    return conn
+
+
+# CONTEXT MANAGER over a pooled connection: rolls back on errors, always returns it to the pool
+@contextmanager
+def db_connection():
+    
+    conn = get_db_connection()
+    
+    try:
+        yield conn
+    except Exception:
+        try:
+            conn.rollback()
+        except mysql.connector.Error as err:
+            logger.error(f"DB error: {err} while rolling back")
+        raise
+    finally:
+        conn.close()
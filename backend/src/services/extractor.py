@@ -0,0 +1,161 @@
+import sys
+import time
+import mysql.connector
+import pandas as pd
+from contextlib import closing
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config.load_env import workspace_gid, extract_workers, extract_chunk_size
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.db_client import db_connection
+from services.asana_data import get_tasks
+from services.report_cache import invalidate_report_snapshot
+from services.task_cache import get_ancestry_cache_stats
+from services.asana_client import get_rate_limit_stats
+
+
+# GET USERS to extract from 'bot', one user_id per user_name
+def get_bot_users():
+    
+    with db_connection() as conn, closing(conn.cursor(dictionary=True)) as cursor:
+        cursor.execute("SELECT user_id, user_name FROM bot WHERE user_name IS NOT NULL ORDER BY date_added DESC")
+        rows = cursor.fetchall()
+    
+    users = {}
+    for row in rows:
+        users.setdefault(row['user_name'], row['user_id'])
+    
+    return [(user_id, user_name) for user_name, user_id in users.items()]
+
+
+# empty / NaN values are stored as NULL
+def db_value(value):
+    return value if pd.notna(value) and value != '' else None
+
+
+# ROWS for table 'tasks' from a user's tasks_df
+def task_rows(user_name, tasks_df, day):
+    
+    rows = []
+    
+    for row in tasks_df.itertuples():
+        project_name = ', '.join(row.project_name) if isinstance(row.project_name, list) else row.project_name
+        rows.append((
+            db_value(project_name),
+            user_name,
+            db_value(row.task_name),
+            db_value(row.due_on),
+            db_value(row.notes),
+            db_value(row.url),
+            day
+        ))
+    
+    return rows
+
+
+# FETCH today tasks of a single user
+def extract_user(user_id, user_name, day):
+    tasks_df = get_tasks(user_id, workspace_gid)
+    return task_rows(user_name, tasks_df, day) if not tasks_df.empty else []
+
+
+# WRITE a chunk of users in one transaction, replacing their rows for the day
+def write_chunk(user_rows, day):
+    
+    user_names = list(user_rows)
+    rows = [row for rows in user_rows.values() for row in rows]
+    
+    with db_connection() as conn, closing(conn.cursor()) as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM tasks
+            WHERE date_extracted = %s
+            AND user_name IN ({', '.join(['%s'] * len(user_names))})
+            """,
+            (day,) + tuple(user_names)
+        )
+        cursor.executemany(
+            """
+            INSERT INTO tasks (project_name, user_name, task_name, due_on, notes, url, date_extracted)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            rows
+        )
+        conn.commit()
+    
+    return len(rows)
+
+
+# EXTRACT today tasks of every bot user into 'tasks'
+def extract_daily_tasks(day=None):
+    
+    day = day or date.today()
+    started = time.monotonic()
+    
+    users = get_bot_users()
+    logger.info(f"extracting tasks for {len(users)} users, {extract_workers} workers")
+    
+    stats = {"users": len(users), "written_users": 0, "empty_users": 0, "failed_users": 0, "tasks": 0}
+    kept_users = {"empty": [], "failed": []}
+    pending = {}
+    
+    with ThreadPoolExecutor(max_workers=extract_workers) as executor:
+        futures = {executor.submit(extract_user, user_id, user_name, day): user_name for user_id, user_name in users}
+        
+        for future in as_completed(futures):
+            user_name = futures[future]
+            
+            try:
+                rows = future.result()
+            except Exception as err:
+                logger.error(f"error: {err} while extracting tasks for user: {user_name}")
+                kept_users["failed"].append(user_name)
+                continue
+            
+            # get_tasks returns nothing on asana errors too, so existing rows of empty users are kept
+            if not rows:
+                kept_users["empty"].append(user_name)
+                continue
+            
+            pending[user_name] = rows
+            
+            if len(pending) >= extract_chunk_size:
+                stats["tasks"] += write_chunk(pending, day)
+                stats["written_users"] += len(pending)
+                pending = {}
+    
+    if pending:
+        stats["tasks"] += write_chunk(pending, day)
+        stats["written_users"] += len(pending)
+    
+    stats["empty_users"], stats["failed_users"] = len(kept_users["empty"]), len(kept_users["failed"])
+    
+    # their rows of the day, if any, are from an earlier run
+    for reason, user_names in kept_users.items():
+        if user_names:
+            logger.warning(f"no tasks written for {len(user_names)} {reason} users, earlier rows kept: {sorted(user_names)}")
+    
+    # reports read the new rows
+    invalidate_report_snapshot(day)
+    
+    stats["seconds"] = round(time.monotonic() - started, 2)
+    stats["tasks_per_second"] = round(stats["tasks"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    logger.info(f"extraction done for {day}: {stats}")
+    logger.info(f"ancestry cache: {get_ancestry_cache_stats()}, asana rate limits: {get_rate_limit_stats()}")
+    
+    return stats
+
+
+# python -m services.extractor
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    
+    try:
+        extract_daily_tasks()
+    except mysql.connector.Error as err:
+        logger.error(f"DB error: {err}")
+        sys.exit(1)
@@ -0,0 +1,49 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+# TTL LRU CACHE in process memory, bounded to `maxsize` entries
+class TTLCache:
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict() # key -> (expires_at, value), least recently used first
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+    
+    # value of a live entry, None on miss / expiry
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.stats["misses"] += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+    
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+    
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, size=len(self.entries))
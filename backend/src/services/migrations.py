@@ -0,0 +1,184 @@
+import sys
+import mysql.connector
+from contextlib import closing
+from datetime import date
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.db_client import db_connection
+from services.report_engine import report_query, tasks_version_query
+
+# versioned schema of the bot tables, applied in order and recorded in schema_migrations
+# a step is either a DDL string or an index tuple (table, index_name, columns)
+migrations = [
+    (1, "create tasks, notes and bot tables", [
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            project_name VARCHAR(512),
+            user_name VARCHAR(255) NOT NULL,
+            task_name TEXT,
+            due_on DATE NULL,
+            notes TEXT,
+            url VARCHAR(512),
+            date_extracted DATE NOT NULL
+        ) CHARACTER SET utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS notes (
+            user_name VARCHAR(255) NOT NULL,
+            note TEXT,
+            date_added DATE NOT NULL,
+            UNIQUE KEY uq_notes_user_date (user_name, date_added)
+        ) CHARACTER SET utf8mb4
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS bot (
+            user_id BIGINT PRIMARY KEY,
+            tg_user VARCHAR(255),
+            user_name VARCHAR(255),
+            user_token VARCHAR(255),
+            user_gid VARCHAR(64),
+            date_added DATE
+        ) CHARACTER SET utf8mb4
+        """,
+    ]),
+    (2, "composite indexes for report, note and tg_user lookups", [
+        # report: WHERE date_extracted = ? (AND user_name IN ...), joined on user_name
+        ("tasks", "idx_tasks_date_user", ("date_extracted", "user_name")),
+        # fetch_note / store_note: WHERE user_name = ? AND date_added = ?
+        ("notes", "idx_notes_user_date", ("user_name", "date_added")),
+        # report: WHERE date_added = ? GROUP BY user_name
+        ("notes", "idx_notes_date_user", ("date_added", "user_name")),
+        # get_tg_users / load_tg_users: WHERE user_name IN (...) GROUP BY user_name, covers tg_user
+        ("bot", "idx_bot_user_tg", ("user_name", "tg_user")),
+    ]),
+]
+
+# queries that must use the indexes above: (name, sql, params, {EXPLAIN table / alias: expected index})
+explain_checks = [
+    ("report", report_query, (date.today(), date.today()), {
+        "t": "idx_tasks_date_user",
+        "notes": "idx_notes_date_user",
+    }),
+    ("tasks_version", tasks_version_query, (date.today(),), {
+        "tasks": "idx_tasks_date_user",
+    }),
+    ("fetch_note", "SELECT note FROM notes WHERE user_name = %s AND date_added = %s", ("", date.today()), {
+        "notes": ("idx_notes_user_date", "uq_notes_user_date"),
+    }),
+    ("get_tg_users", "SELECT user_name, MAX(tg_user) FROM bot WHERE user_name IN (%s) AND tg_user IS NOT NULL GROUP BY user_name", ("",), {
+        "bot": "idx_bot_user_tg",
+    }),
+    ("get_redis_data", "SELECT tg_user, user_name, user_token, user_gid FROM bot WHERE user_id = %s", (0,), {
+        "bot": "PRIMARY",
+    }),
+]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+# CREATE INDEX unless the table already has an index on the same leading columns
+def ensure_index(cursor, table, index_name, columns):
+
+    cursor.execute(
+        """
+        SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+        """,
+        (table,)
+    )
+
+    for existing_name, existing_columns in cursor.fetchall():
+        if existing_name == index_name or existing_columns.split(',')[:len(columns)] == list(columns):
+            logger.info(f"index on {table} ({', '.join(columns)}) already present as {existing_name}")
+            return
+
+    cursor.execute(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})")
+    logger.info(f"created index {index_name} on {table} ({', '.join(columns)})")
+
+
+# APPLY pending migrations in order, each version is recorded right after its steps
+# DDL commits implicitly in MySQL, so every step is written to be re-runnable
+def run_migrations():
+
+    with db_connection() as conn, closing(conn.cursor()) as cursor:
+        ensure_migrations_table(cursor)
+        done = applied_versions(cursor)
+
+        for version, name, steps in migrations:
+            if version in done:
+                continue
+
+            logger.info(f"applying migration {version}: {name}")
+
+            for step in steps:
+                if isinstance(step, tuple):
+                    ensure_index(cursor, *step)
+                else:
+                    cursor.execute(step)
+
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+            conn.commit()
+            done.add(version)
+
+        return sorted(done)
+
+
+# EXPLAIN the hot queries and report the ones that don't use their index
+def check_indexes():
+
+    problems = []
+
+    with db_connection() as conn, closing(conn.cursor(dictionary=True)) as cursor:
+        for name, sql, params, expected in explain_checks:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plan = cursor.fetchall()
+
+            for table, index_names in expected.items():
+                index_names = index_names if isinstance(index_names, tuple) else (index_names,)
+                keys = [row.get('key') for row in plan if row.get('table') == table]
+
+                if not any(key in index_names for key in keys):
+                    problems.append(f"{name}: {table} uses {keys or 'no index'}, expected {' / '.join(index_names)}")
+
+    for problem in problems:
+        logger.warning(f"index check failed - {problem}")
+
+    return problems
+
+
+# python -m services.migrations [--check]
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    try:
+        run_migrations()
+
+        if "--check" in sys.argv and check_indexes():
+            sys.exit(1)
+
+    except mysql.connector.Error as err:
+        logger.error(f"DB error: {err}")
+        sys.exit(1)
@@ -1,13 +1,13 @@
 import redis
 import uuid
 import urllib.parse
-import requests
-
 from config.load_env import client_id, client_secret, redirect_uri, auth_url
 
 from services.redis_client import get_redis_client
 redis_client = get_redis_client()
 
+from services.asana_client import asana_post
+
 
 # dynamically generate oauth link
 def gen_oauth_link():
@@ -53,7 +53,9 @@ def get_token(auth_code):
     }
     
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = requests.post(token_url, data=payload, headers=headers)
+    
+    # an auth code is single use - a retry after a lost response would only get invalid_grant
+    response = asana_post(token_url, data=payload, headers=headers, retries=0)
     
     if response.status_code == 200:
         return response.json().get("access_token")
@@ -0,0 +1,270 @@
+import re
+import html
+from datetime import datetime
+
+# task rows are plain tuples: (project_name, task_name, url, notes, due_on)
+# project_name is a str or a list of names, due_on a date str, None / NaN / '' when empty
+
+trailer = " (...)"
+
+# telegram limits of a message text and of a photo caption
+text_limit = 4096
+caption_limit = 1024
+
+# tags, entities and single characters - the units html is never split inside of
+html_token = re.compile(r'<[^>]*>|&#?\w+;|.', re.S)
+tag_name = re.compile(r'<(/?)([a-zA-Z]+)')
+
+
+def is_blank(value):
+    return value is None or value != value or value == ''
+
+
+def date_header(now=None):
+    return (now or datetime.now()).strftime("%d %b %Y · %a")
+
+
+def crop_note(note, max_note_len):
+    if max_note_len and len(note) > max_note_len:
+        return note[:max_note_len - 3].rstrip() + trailer
+    return note
+
+
+# parse a due date once, unparsable / empty dates sort last
+def parse_due(due_on, date_format):
+    try:
+        return datetime.strptime(due_on, date_format)
+    except (TypeError, ValueError):
+        return datetime.max
+
+
+# GROUP rows by project name in sorted order, rows without a project are left out
+def group_rows(rows):
+    
+    groups = {}
+    
+    for row in rows:
+        project = row[0]
+    
+        if isinstance(project, list):
+            project = ', '.join(project)
+        elif project is None or project != project:
+            continue
+    
+        groups.setdefault(project, []).append(row)
+    
+    return sorted(groups.items())
+
+
+# ROWS from a tasks DataFrame in one pass over its columns
+def df_rows(df):
+    
+    notes = df['notes'] if 'notes' in df.columns else [None] * len(df)
+    due_on = df['due_on'] if 'due_on' in df.columns else [None] * len(df)
+    
+    return list(zip(df['project_name'], df['task_name'], df['url'], notes, due_on))
+
+
+# first non-empty extra_note of report rows, None when there is none
+def df_extra_note(df):
+    
+    if 'extra_note' not in df.columns:
+        return None
+    
+    for note in df['extra_note']:
+        if note is not None and note == note:
+            return note
+    return None
+
+
+# SPLIT an html text longer than limit (first_limit for the first piece)
+# tags open at a cut are closed and reopened on the next piece
+def split_html(text, limit, first_limit=None):
+    
+    pieces = []
+    current = ''
+    piece_limit = first_limit or limit
+    open_tags = [] # (name, opening tag)
+    
+    for token in html_token.findall(text):
+        closing = ''.join(f"</{name}>" for name, tag in reversed(open_tags))
+        match = tag_name.match(token)
+        
+        # an opening tag must fit together with its own closing tag
+        token_closing = ''
+        if match and not match.group(1) and not token.endswith('/>'):
+            token_closing = f"</{match.group(2)}>"
+        
+        if len(current) + len(token) + len(token_closing) + len(closing) > piece_limit and current:
+            pieces.append(current + closing)
+            current = ''.join(tag for name, tag in open_tags)
+            piece_limit = limit
+        
+        current += token
+        
+        if match and not token.endswith('/>'):
+            if match.group(1):
+                if open_tags and open_tags[-1][0] == match.group(2):
+                    open_tags.pop()
+            else:
+                open_tags.append((match.group(2), token))
+    
+    pieces.append(current)
+    return pieces
+
+
+# PAGINATE a message into pages of up to limit (first_limit for the first page, e.g. a caption)
+# sections are (section_header, [entries], section_end) - a section moves to the next page whole
+# when it fits there, longer ones are split between entries with the section header repeated
+# with no limit the single page is header + sections + footer as is
+def paginate(header, sections, footer='', limit=None, first_limit=None):
+    
+    pages = []
+    page = {"text": header, "start": len(header), "limit": first_limit or limit}
+    
+    def fits(text):
+        return page["limit"] is None or len(page["text"]) + len(text) <= page["limit"]
+    
+    def has_content():
+        return len(page["text"]) > page["start"]
+    
+    def flush():
+        pages.append(page["text"].rstrip())
+        page.update(text='', start=0, limit=limit)
+    
+    # add a block, pieces over a whole page are split on html tokens
+    def add(block):
+        if not fits(block) and has_content():
+            flush()
+        
+        if fits(block):
+            page["text"] += block
+            return
+        
+        pieces = split_html(block, limit or page["limit"], first_limit=page["limit"] - len(page["text"]))
+        for piece in pieces[:-1]:
+            page["text"] += piece
+            flush()
+        page["text"] += pieces[-1]
+    
+    for section_header, entries, section_end in sections:
+        whole = section_header + ''.join(entries) + section_end
+        
+        if fits(whole):
+            page["text"] += whole
+            continue
+        
+        if has_content() and (limit is None or len(whole) <= limit):
+            flush()
+            page["text"] += whole
+            continue
+        
+        for idx, entry in enumerate(entries):
+            if idx == 0 or not fits(entry):
+                if idx and has_content():
+                    flush()
+                entry = section_header + entry
+            add(entry)
+        
+        if fits(section_end):
+            page["text"] += section_end
+    
+    if footer:
+        add(footer)
+    
+    # no trailing page of a lone section end
+    if page["text"].strip() or not pages:
+        pages.append(page["text"])
+    return pages
+
+
+# RENDER mytasks message as pages, due_on as YYYY-mm-dd
+def render_mytasks(rows, extra_note, max_note_len=None, limit=None, first_limit=None, now=None):
+    
+    sections = []
+    
+    for project, group in group_rows(rows):
+        dated = []
+        for row in group:
+            due_date = None if is_blank(row[4]) else datetime.strptime(row[4], '%Y-%m-%d')
+            dated.append((due_date or datetime.max, due_date, row))
+        
+        dated.sort(key=lambda item: item[0])
+        entries = []
+        
+        for idx, (sort_key, due_date, row) in enumerate(dated, start=1):
+            notes = '-' if is_blank(row[3]) else html.escape(row[3])
+            due = due_date.strftime("%d-%m-%Y") if due_date else 'No DL'
+            
+            entries.append(
+                f'{idx}. <a href="{html.escape(row[2])}">{html.escape(row[1])}</a> · <code>{due}</code>\n'
+                f'{crop_note(notes, max_note_len)}\n\n'
+            )
+        
+        sections.append((f"━\n<b>{html.escape(project or 'No project')}</b>\n", entries, "\n"))
+    
+    footer = f"<b>✲ Note:</b>\n{crop_note(html.escape(extra_note), max_note_len)}\n\n" if extra_note else ''
+    
+    return paginate(f"<b>{date_header(now)}</b>\n\n", sections, footer, limit, first_limit)
+
+
+# escaping of the report format, '&' is replaced last as it always was
+def report_escape(text):
+    return text.replace("<", "&lt;").replace(">", "&gt;").replace("&", "&amp;")
+
+
+# RENDER report of a user as pages, due_on as dd-mm-YYYY / No DL
+def render_report(rows, user, tg_user_name, extra_note, max_note_len=None, limit=None, now=None):
+    
+    if tg_user_name:
+        header = f"<b>{user}</b> @{tg_user_name}\n{date_header(now)}\n\n"
+    else:
+        header = f"<b>{user}</b>\n{date_header(now)}\n\n"
+    
+    sections = []
+    
+    for project, group in group_rows(rows):
+        entries = []
+        
+        for idx, row in enumerate(sorted(group, key=lambda row: parse_due(row[4], '%d-%m-%Y')), start=1):
+            notes = '-' if is_blank(row[3]) else row[3]
+            due = 'No DL' if is_blank(row[4]) else row[4]
+            
+            entries.append(
+                f"{idx}. <a href='{report_escape(row[2])}'>{report_escape(row[1])}</a> · <code>{due}</code>\n"
+                f"{crop_note(notes, max_note_len)}\n\n"
+            )
+        
+        sections.append((f"━\n<b>{project}</b>\n", entries, "\n"))
+    
+    footer = f"<b>✲ Note:</b>\n{crop_note(extra_note, max_note_len)}\n\n" if extra_note is not None else ''
+    
+    return paginate(header, sections, footer, limit)
+
+
+# RENDER AV report of a user as pages, projects in name order with 'No project' last
+def render_report_av(rows, user, tg_user_name, extra_note, max_note_len=None, limit=None, now=None):
+    
+    def esc(text):
+        return html.escape(text, quote=False)
+    
+    if tg_user_name:
+        header = f"<b>{esc(user)}</b> @{esc(tg_user_name)}\n{date_header(now)}\n\n"
+    else:
+        header = f"<b>{esc(user)}</b>\n{date_header(now)}\n\n"
+    
+    groups = group_rows(rows)
+    groups = [g for g in groups if g[0] != 'No project'] + [g for g in groups if g[0] == 'No project']
+    sections = []
+    
+    for project, group in groups:
+        entries = [
+            f"{idx}. <a href=\"{esc(row[2])}\">{esc(row[1])}</a>"
+            f" · <code>{esc(row[4] or 'No DL')}</code>\n\n"
+            for idx, row in enumerate(sorted(group, key=lambda row: parse_due(row[4], '%d-%m-%Y')), start=1)
+        ]
+        sections.append((f"━\n<b>{esc(project)}</b>\n", entries, ''))
+    
+    footer = f"<b>✲ Note:</b>\n{esc(crop_note(extra_note, max_note_len))}\n\n" if extra_note is not None else ''
+    
+    return [page.rstrip() for page in paginate(header, sections, footer, limit)]
@@ -0,0 +1,316 @@
+import sys
+import html
+import random
+import timeit
+import pandas as pd
+from datetime import datetime, date, timedelta
+
+from services.render import df_rows, df_extra_note, render_mytasks, render_report, render_report_av
+
+# MICRO-BENCHMARK of services.render against the pandas formatters it replaced, outputs must match byte for byte
+# the formatters are kept here as the reference, compared without length limits
+# python -m services.render_benchmark [users] [tasks per user]
+
+
+# FORMAT mytasks message, pandas reference of render_mytasks
+def format_df(df, extra_note, max_note_len=None):
+    
+    current_date = datetime.now().strftime("%d %b %Y · %a")
+    message = f"<b>{current_date}</b>\n\n"
+    
+    # convert project list to str
+    df['project_name'] = df['project_name'].apply(lambda x: ', '.join(x) if isinstance(x, list) else x)
+                                                  
+    # group tasks by project_name 
+    grouped_tasks = df.groupby('project_name')
+    
+    for project, group in grouped_tasks:
+        if isinstance(project, list):
+            project_name = ', '.join(project)  
+        else:
+            project_name = project if project else 'No project'
+ 
+        project_escaped = html.escape(project_name)
+        message += f"━\n<b>{project_escaped}</b>\n"
+    
+        # sort tasks by due date
+        sorted_group = sorted(
+            group.itertuples(),
+            key=lambda row: datetime.strptime(row.due_on, '%Y-%m-%d') if row.due_on else datetime.max
+        )
+        
+        for idx, row in enumerate(sorted_group, start=1):
+            
+            # escape all fields to avoid HTML issues
+            task_escaped = html.escape(row.task_name)
+            url_escaped = html.escape(row.url)
+            notes = html.escape(row.notes) if row.notes else '-' 
+            #notes = html.escape(getattr(row, 'notes', '-')) if hasattr(row, 'notes') else '-'
+            due = html.escape(row.due_on) if row.due_on else 'No DL'
+    
+            # format due date if available
+            if due != 'No DL':
+                due_date = datetime.strptime(due, '%Y-%m-%d')
+                due = due_date.strftime("%d-%m-%Y")
+    
+            # truncate notes if necessary
+            if max_note_len and len(notes) > max_note_len:
+                notes = notes[:max_note_len - 3].rstrip() + " (...)"
+    
+            task_entry = f'{idx}. <a href="{url_escaped}">{task_escaped}</a> · <code>{due}</code>\n{notes}\n\n'
+            message += task_entry
+    
+        message += "\n"
+    
+    # handle extra note if provided
+    if extra_note:
+        extra_escaped = html.escape(extra_note)
+        if max_note_len and len(extra_escaped) > max_note_len:
+            extra_escaped = extra_escaped[:max_note_len - 3].rstrip() + " (...)"
+        message += f"<b>✲ Note:</b>\n{extra_escaped}\n\n"
+    
+    return message
+
+
+# FORMAT report message, pandas reference of render_report
+def format_report(user_df, user, tg_user_name, max_note_len=None):
+    
+    current_date = datetime.now().strftime("%d %b %Y · %a")
+    
+    if tg_user_name:
+        message = f"<b>{user}</b> @{tg_user_name}\n{current_date}\n\n"
+    else:
+        message = f"<b>{user}</b>\n{current_date}\n\n"
+    
+    grouped_tasks = user_df.groupby('project_name')  # group tasks by project
+    
+    for project, group in grouped_tasks:
+        project_name = project  
+        message += f"━\n<b>{project_name}</b>\n"
+        
+        # sort tasks on due date
+        def parse_due(x):
+            try:
+                return datetime.strptime(x, '%d-%m-%Y')
+            except ValueError:
+                # 'No DL' or invalid => treat as something far in the future
+                return datetime.max
+    
+        sorted_group = sorted(group.itertuples(), key=lambda row: parse_due(row.due_on))
+    
+        # reset idx, enumerate from 1
+        for idx, row in enumerate(sorted_group, start=1):
+            task = row.task_name
+            url = row.url
+            notes = row.notes if row.notes else '-'  
+            due = row.due_on if row.due_on else 'No DL'
+    
+            # crop notes if they exceed length limit
+            if max_note_len and len(notes) > max_note_len:
+                notes = notes[:max_note_len - 3].rstrip() + " (...)"
+    
+            # escape characters for HTML formatting
+            task_escaped = (task.replace("<", "&lt;")
+                                 .replace(">", "&gt;")
+                                 .replace("&", "&amp;"))
+            url_escaped = (url.replace("<", "&lt;")
+                               .replace(">", "&gt;")
+                               .replace("&", "&amp;"))
+    
+            task_entry = f"{idx}. <a href='{url_escaped}'>{task_escaped}</a> · <code>{due}</code>\n{notes}\n\n"
+            message += task_entry
+    
+        message += "\n"
+    
+    # handle extra notes
+    if 'extra_note' in user_df.columns:
+        first_note = user_df['extra_note'].dropna()
+        
+        if not first_note.empty:
+            extra_note = first_note.iloc[0]
+            
+            # crop note if needed
+            if max_note_len and len(extra_note) > max_note_len:
+                extra_note = extra_note[:max_note_len - 3].rstrip() + " (...)"
+            message += f"<b>✲ Note:</b>\n{extra_note}\n\n"
+    
+    return message
+
+
+# FORMAT report for AV, pandas reference of render_report_av
+def format_report_av(user_df, user, tg_user_name, max_note_len=None):
+    def esc(text):
+        return html.escape(text, quote=False)
+    
+    now = datetime.now().strftime("%d %b %Y · %a")
+    if tg_user_name:
+        header = f"<b>{esc(user)}</b> @{esc(tg_user_name)}\n{now}\n\n"
+    else:
+        header = f"<b>{esc(user)}</b>\n{now}\n\n"
+    
+    segments = [header]
+    trailer = " (...)"
+    
+    # sort tasks on due date
+    def parse_due(x):
+        try:
+            return datetime.strptime(x, "%d-%m-%Y")
+        except:
+            return datetime.max
+    
+    groups = list(user_df.groupby('project_name'))
+    normal_groups = [(p, g) for p, g in groups if p != 'No project']
+    no_project_groups = [(p, g) for p, g in groups if p == 'No project']
+    normal_groups.sort(key=lambda x: x[0] or '')
+    ordered_groups = normal_groups + no_project_groups
+    
+    for project, group in ordered_groups:  # group tasks by project
+        seg = f"━\n<b>{esc(project)}</b>\n"
+        tasks = sorted(group.itertuples(), key=lambda row: parse_due(row.due_on))
+        for idx, row in enumerate(tasks, start=1):  # reset idx, enumerate from 1
+            seg += (
+                f"{idx}. <a href=\"{esc(row.url)}\">{esc(row.task_name)}</a>"
+                f" · <code>{esc(row.due_on or 'No DL')}</code>\n\n"
+            )
+        segments.append(seg)
+    
+    # handle extra notes
+    if 'extra_note' in user_df.columns:
+        extras = user_df['extra_note'].dropna()
+        if not extras.empty:
+            note = extras.iloc[0]
+            if max_note_len and len(note) > max_note_len:  # crop note if needed
+                note = note[:max_note_len - 3].rstrip() + " (...)"
+            segments.append(f"<b>✲ Note:</b>\n{esc(note)}\n\n")
+    
+    return ["".join(segments).rstrip()]
+
+
+def sample_text(rng, words):
+    vocabulary = ['план', 'report', 'fix', 'A&B', '<draft>', 'review', "client's", 'задача', '"quoted"', 'api']
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+
+# tasks of one user as get_tasks returns them: project lists, YYYY-mm-dd due dates
+def sample_mytasks_df(rng, tasks):
+    
+    projects = [['Arska'], ['Arska', 'Ops'], [], ['Web <beta>'], ['R&D']]
+    rows = []
+    
+    for i in range(tasks):
+        due = date.today() + timedelta(days=rng.randint(-5, 30))
+        rows.append({
+            'task_gid': str(1000 + i),
+            'task_name': sample_text(rng, rng.randint(2, 8)),
+            'due_on': due.isoformat() if rng.random() > 0.2 else None,
+            'project_name': list(rng.choice(projects)),
+            'notes': sample_text(rng, rng.randint(0, 30)) or None,
+            'url': f"https://app.asana.com/0/0/{1000 + i}?a=1&b=2",
+        })
+    
+    return pd.DataFrame(rows)
+
+
+# report rows of one user as query_report returns them: dd-mm-YYYY / No DL, normalized projects
+def sample_report_df(rng, user, tasks):
+    
+    projects = ['Arska', 'Arska, Ops', 'No project', 'Web <beta>', 'R&D']
+    extra_note = sample_text(rng, 12) if rng.random() > 0.5 else None
+    rows = []
+    
+    for i in range(tasks):
+        due = date.today() + timedelta(days=rng.randint(-5, 30))
+        rows.append({
+            'project_name': rng.choice(projects),
+            'user_name': user,
+            'task_name': sample_text(rng, rng.randint(2, 8)),
+            'due_on': due.strftime("%d-%m-%Y") if rng.random() > 0.2 else 'No DL',
+            'notes': sample_text(rng, rng.randint(0, 30)) or None,
+            'url': f"https://app.asana.com/0/0/{1000 + i}?a=1&b=2",
+            'extra_note': extra_note,
+        })
+    
+    return pd.DataFrame(rows)
+
+
+# CHECK PAGES of long messages against their limits: entries and notes longer than a page
+# are split on html tokens, every page must still fit, tags closed at the cut included
+def check_pagination(runs=30, seed=7):
+    
+    from services.render import text_limit, caption_limit
+    
+    rng = random.Random(seed)
+    limits = [(text_limit, caption_limit), (text_limit, None), (300, 120)]
+    
+    for _ in range(runs):
+        rows = df_rows(sample_mytasks_df(rng, rng.randint(1, 15)))
+        rows = [
+            (project, sample_text(rng, rng.choice([5, 400])), url, sample_text(rng, rng.choice([30, 800])), due_on)
+            for project, task_name, url, notes, due_on in rows
+        ]
+        extra_note = sample_text(rng, rng.randint(0, 300))
+        
+        for limit, first_limit in limits:
+            pages = render_mytasks(rows, extra_note, limit=limit, first_limit=first_limit)
+            pages_av = render_report_av(rows, 'User', 'tg_user', extra_note, limit=limit)
+            
+            for idx, page in enumerate(pages):
+                page_limit = first_limit if idx == 0 and first_limit else limit
+                assert len(page) <= page_limit, f"mytasks page {idx} is {len(page)} chars, limit {page_limit}"
+            
+            for idx, page in enumerate(pages_av):
+                assert len(page) <= limit, f"report_av page {idx} is {len(page)} chars, limit {limit}"
+    
+    print(f"pagination: {runs} runs, every page within its limit")
+
+
+def best_of(func, number, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def run_benchmark(users=40, tasks=15, seed=7):
+    
+    rng = random.Random(seed)
+    mytasks_df = sample_mytasks_df(rng, tasks)
+    extra_note = sample_text(rng, 20)
+    report_dfs = {f"User {i} <{i}>": sample_report_df(rng, f"User {i} <{i}>", tasks) for i in range(users)}
+    
+    # format_df mutates its DataFrame, it gets a fresh copy per call
+    cases = {
+        "mytasks": (
+            lambda: [format_df(mytasks_df.copy(), extra_note, max_note_len=85)],
+            lambda: render_mytasks(df_rows(mytasks_df), extra_note, max_note_len=85),
+        ),
+        "report (team)": (
+            lambda: [[format_report(df, user, 'tg_user', max_note_len=60)]
+                     for user, df in report_dfs.items()],
+            lambda: [render_report(df_rows(df), user, 'tg_user', df_extra_note(df), max_note_len=60)
+                     for user, df in report_dfs.items()],
+        ),
+        "report_av (team)": (
+            lambda: [format_report_av(df, user, 'tg_user', max_note_len=60)
+                     for user, df in report_dfs.items()],
+            lambda: [render_report_av(df_rows(df), user, 'tg_user', df_extra_note(df), max_note_len=60)
+                     for user, df in report_dfs.items()],
+        ),
+    }
+    
+    results = {}
+    
+    for name, (pandas_func, render_func) in cases.items():
+        if pandas_func() != render_func():
+            raise AssertionError(f"{name}: render output differs from the pandas formatter")
+    
+        number = 20 if name == "mytasks" else 3
+        pandas_time, render_time = best_of(pandas_func, number), best_of(render_func, number)
+        results[name] = (pandas_time, render_time)
+    
+        print(f"{name:<18} pandas {pandas_time * 1000:8.2f}ms   render {render_time * 1000:8.2f}ms   "
+              f"x{pandas_time / render_time:.1f}")
+    
+    return results
+
+
+if __name__ == "__main__":
+    check_pagination()
+    run_benchmark(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,69 @@
+import json
+import redis.exceptions
+from datetime import date
+
+from config.load_env import report_snapshot_ttl
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.redis_client import get_redis_client
+redis_client = get_redis_client()
+
+
+# version of the day's report content, bumped on every new extraction / note
+def report_version_key(day):
+    return f"report_version:{day.isoformat()}"
+
+
+def report_snapshot_key(day, version):
+    return f"report_snapshot:{day.isoformat()}:v{version}"
+
+
+# GET CACHED daily snapshot for the current content version, None on miss
+# data_version comes from the tasks rows themselves, so writers that never bump the version still show up
+def get_cached_snapshot(data_version, day=None):
+    
+    day = day or date.today()
+    
+    try:
+        version = f"{redis_client.get(report_version_key(day)) or 0}:{data_version}"
+        cached = redis_client.get(report_snapshot_key(day, version))
+        
+        if cached:
+            return json.loads(cached), version
+        return None, version
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while reading report snapshot")
+        return None, None
+
+
+# STORE daily snapshot under the version it was built for
+def cache_snapshot(snapshot, version, day=None):
+    
+    day = day or date.today()
+    
+    if version is None:
+        return
+    
+    try:
+        redis_client.set(report_snapshot_key(day, version),
+                         json.dumps(snapshot, ensure_ascii=False),
+                         ex=report_snapshot_ttl)
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while caching report snapshot")
+
+
+# INVALIDATE the day's snapshot: new version, the old one expires on its own
+def invalidate_report_snapshot(day=None):
+    
+    day = day or date.today()
+    
+    try:
+        pipe = redis_client.pipeline()
+        pipe.incr(report_version_key(day))
+        pipe.expire(report_version_key(day), report_snapshot_ttl)
+        pipe.execute()
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while invalidating report snapshot")
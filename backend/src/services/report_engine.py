@@ -0,0 +1,213 @@
+import mysql.connector
+import pandas as pd
+from contextlib import closing
+from datetime import date
+
+from config.load_env import pm_users, ba_users, av_users
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.db_client import db_connection
+from services.report_cache import get_cached_snapshot, cache_snapshot
+from services.asana_data import get_tg_users
+from services.render import render_report, render_report_av, text_limit
+
+# report groups: include - only these users, exclude - everyone but these users
+report_groups = {
+    'all': {'include': None, 'exclude': pm_users + ba_users + av_users},
+    'pm': {'include': pm_users, 'exclude': None},
+    'ba': {'include': ba_users, 'exclude': None},
+    'av': {'include': av_users, 'exclude': None},
+}
+
+
+# tasks of the day joined with the day's note, params: (date, date)
+# tg users come from the redis index, see get_tg_users
+report_query = """
+    SELECT t.project_name, t.user_name, t.task_name, t.due_on, t.notes, t.url,
+           n.note AS extra_note
+    FROM tasks t
+    LEFT JOIN (
+        SELECT user_name, MAX(note) AS note
+        FROM notes
+        WHERE date_added = %s
+        GROUP BY user_name
+    ) n ON n.user_name = t.user_name
+    WHERE t.date_extracted = %s
+"""
+
+
+# row count and last id of the day's tasks, params: (date,)
+# any insert, delete or re-extraction of the day's rows changes one of them
+tasks_version_query = """
+    SELECT COUNT(*), MAX(id)
+    FROM tasks
+    WHERE date_extracted = %s
+"""
+
+
+# VERSION of the day's tasks rows, cheap: covered by the date index
+def query_tasks_version(day=None):
+    
+    with db_connection() as conn, closing(conn.cursor()) as cursor:
+        cursor.execute(tasks_version_query, (day or date.today(),))
+        count, max_id = cursor.fetchone()
+    
+    return f"{count}.{max_id or 0}"
+
+
+# GET REPORT ROWS in one query
+def query_report():
+    
+    params = (date.today(), date.today())
+    
+    with db_connection() as conn:
+        tasks_df = pd.read_sql(report_query, conn, params=params)
+    
+    # convert due_on format to dd-mm-YYYY / No DL
+    tasks_df['due_on'] = (
+        pd.to_datetime(tasks_df['due_on'], errors='coerce')
+        .dt.strftime("%d-%m-%Y")
+        .fillna("No DL")
+    )
+    
+    # normalize project names
+    if not tasks_df.empty and 'project_name' in tasks_df.columns:
+        tasks_df['project_name'] = (
+            tasks_df['project_name']
+            .fillna('')  # replace NaN with empty str
+            .astype(str) # ensure str
+            .str.strip() # strip whitespace
+        )
+        tasks_df.loc[tasks_df['project_name'] == '', 'project_name'] = 'No project'
+    
+    return tasks_df
+
+
+# SPLIT report rows per user in one groupby pass
+def split_rows(tasks_df):
+    
+    if tasks_df.empty:
+        return {}
+    
+    return {
+        user: user_tasks.reset_index(drop=True)
+        for user, user_tasks in tasks_df.groupby('user_name', sort=False)
+    }
+
+
+# LOAD the day's report rows once and split them per user
+def load_report_snapshot():
+    return split_rows(query_report())
+
+
+# USERS of a group, in snapshot order
+def group_users(users, group):
+    
+    group_def = report_groups[group]
+    include = {user.lower() for user in group_def['include'] or []}
+    exclude = {user.lower() for user in group_def['exclude'] or []}
+    
+    return [
+        user for user in users
+        if (not include or user.lower() in include) and user.lower() not in exclude
+    ]
+
+
+# report message formats, each renders a user's task rows into pages of up to telegram's text limit
+report_formats = {
+    'report': lambda rows, user, tg_user_name, extra_note: render_report(
+        rows, user, tg_user_name, extra_note, max_note_len=60, limit=text_limit
+    ),
+    'report_av': lambda rows, user, tg_user_name, extra_note: render_report_av(
+        rows, user, tg_user_name, extra_note, max_note_len=60, limit=text_limit
+    ),
+}
+
+
+# BUILD the daily snapshot: tg users + rendered messages of every user in every format
+def build_daily_snapshot():
+    
+    tasks_dict = load_report_snapshot()
+    tg_users = get_tg_users(tasks_dict)
+    
+    messages = {fmt: {} for fmt in report_formats}
+    
+    for user, user_df in tasks_dict.items():
+        records = user_df.astype(object).where(user_df.notnull(), None).to_dict('records')
+        
+        # plain tuples for the renderer, the day's note is the same on every row
+        task_rows = [(r['project_name'], r['task_name'], r['url'], r['notes'], r['due_on']) for r in records]
+        extra_note = next((r['extra_note'] for r in records if r['extra_note'] is not None), None)
+        
+        for fmt, render in report_formats.items():
+            messages[fmt][user] = render(task_rows, user, tg_users.get(user), extra_note)
+    
+    return {"users": list(tasks_dict), "tg_users": tg_users, "messages": messages}
+
+
+# GET the daily snapshot from redis, built from DB once per content version
+def get_daily_snapshot():
+    
+    snapshot, version = get_cached_snapshot(query_tasks_version())
+    
+    if snapshot is not None:
+        return snapshot
+    
+    snapshot = build_daily_snapshot()
+    
+    # an empty day isn't cached, tasks may not be extracted yet
+    if snapshot["users"]:
+        cache_snapshot(snapshot, version)
+        logger.info(f"report snapshot built for {len(snapshot['users'])} users, version {version}")
+    
+    return snapshot
+
+
+def check_group(group, user_name):
+    
+    group_def = report_groups[group]
+    
+    if group_def['include'] is not None and not group_def['include']:
+        logger.info(f"{group.upper()} users list is empty")
+        return False
+    
+    logger.info(f"request for {group.upper()} report by {user_name}")
+    return True
+
+
+# MESSAGES of a group in a format from a loaded snapshot
+def group_messages(snapshot, group, fmt='report'):
+    rendered = snapshot["messages"][fmt]
+    return [message for user in group_users(snapshot["users"], group) for message in rendered[user]]
+
+
+# GET rendered MESSAGES for a group in a format, None on errors / empty group
+def get_group_messages(group, fmt='report', user_name=None):
+    
+    if not check_group(group, user_name):
+        return None
+    
+    try:
+        snapshot = get_daily_snapshot()
+    except mysql.connector.Error as err:
+        logger.error(f"DB error: {err}")
+        return None
+    
+    return group_messages(snapshot, group, fmt)
+
+
+# GET rendered MESSAGES of many (group, fmt) views from one snapshot, None per view on errors / empty group
+def get_views_messages(views, user_name=None):
+    
+    try:
+        snapshot = get_daily_snapshot()
+    except mysql.connector.Error as err:
+        logger.error(f"DB error: {err}")
+        return [None] * len(views)
+    
+    return [
+        group_messages(snapshot, group, fmt) if check_group(group, user_name) else None
+        for group, fmt in views
+    ]
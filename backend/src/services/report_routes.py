@@ -0,0 +1,86 @@
+from datetime import datetime, time
+
+from config.load_env import report_routes
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.report_engine import report_groups, report_formats, get_views_messages
+
+
+# NO DATA message of a route whose view is empty
+def no_data_message():
+    return (
+        f"<b>{datetime.now().strftime('%d %b %Y · %a')}</b>\n\n"
+        "<code>No data is present for now</code>"
+    )
+
+
+# PARSE a route from config, None when it has no chat or is invalid
+def parse_route(route):
+    
+    if not route.get('chat_id'):
+        logger.info(f"no chat id for {route.get('group')} report route, skipping")
+        return None
+    
+    group, fmt = route.get('group', 'all'), route.get('format', 'report')
+    
+    if group not in report_groups or fmt not in report_formats:
+        logger.error(f"unknown group / format in report route: {route}")
+        return None
+    
+    try:
+        hour, minute = (int(part) for part in route.get('time', '07:05').split(':'))
+    
+        return {
+            "chat_id": int(route['chat_id']),
+            "group": group,
+            "fmt": fmt,
+            "days": tuple(route.get('days', (0, 1, 2, 3, 4, 5, 6))),
+            "time": time(hour=hour, minute=minute),
+            "run_on_start": bool(route.get('run_on_start', False)),
+        }
+    
+    except (TypeError, ValueError) as err:
+        logger.error(f"invalid report route: {route}, {err}")
+        return None
+
+
+def load_routes(routes=None):
+    parsed = [parse_route(route) for route in (report_routes if routes is None else routes)]
+    return [route for route in parsed if route is not None]
+
+
+# SCHEDULES of routes: routes sharing a time run in one job on the union of their days, in config order
+def schedule_routes(routes):
+    
+    schedules = {}
+    
+    for route in routes:
+        schedules.setdefault(route['time'], []).append(route)
+    
+    return [
+        (report_time, tuple(sorted({day for route in schedule for day in route['days']})), schedule)
+        for report_time, schedule in schedules.items()
+    ]
+
+
+# ROUTES due on a day, weekday as in the job queue: 0 is Sunday
+def routes_for_day(routes, weekday):
+    return [route for route in routes if weekday in route['days']]
+
+
+# BUILD OUTBOX of a job: every (group, fmt) view is rendered from one snapshot, {chat_id: [messages]}
+def build_outbox(routes):
+    
+    views = list(dict.fromkeys((route['group'], route['fmt']) for route in routes))
+    messages = dict(zip(views, get_views_messages(views, user_name='scheduler')))
+    
+    outbox = {}
+    
+    for route in routes:
+        outbox.setdefault(route['chat_id'], []).extend(
+            messages[(route['group'], route['fmt'])] or [no_data_message()]
+        )
+    
+    return outbox
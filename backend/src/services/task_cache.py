@@ -0,0 +1,90 @@
+import json
+import threading
+import redis.exceptions
+
+from config.load_env import ancestry_ttl, ancestry_negative_ttl
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.redis_client import get_redis_client
+redis_client = get_redis_client()
+
+# hit/miss counters of the ancestry cache for this process
+ancestry_stats = {"hits": 0, "misses": 0}
+stats_lock = threading.Lock()
+
+
+def ancestry_key(task_gid):
+    return f"task_ancestry:{task_gid}"
+
+
+# GET CACHED task -> (project_names, parent_gid), misses are left out
+def get_cached_ancestry(task_gids):
+    
+    task_gids = list(task_gids)
+    cached = {}
+    
+    if not task_gids:
+        return cached
+    
+    try:
+        values = redis_client.mget([ancestry_key(gid) for gid in task_gids])
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while reading task ancestry cache")
+        values = [None] * len(task_gids)
+    
+    for gid, value in zip(task_gids, values):
+        if value is None:
+            continue
+        record = json.loads(value)
+        cached[gid] = (record.get('projects', []), record.get('parent'))
+    
+    with stats_lock:
+        ancestry_stats["hits"] += len(cached)
+        ancestry_stats["misses"] += len(task_gids) - len(cached)
+    
+    return cached
+
+
+# CACHE fetched ancestry, orphans (no projects, no parent) are cached for a shorter time
+def cache_ancestry(ancestry):
+    
+    if not ancestry:
+        return
+    
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        
+        for gid, (project_names, parent_gid) in ancestry.items():
+            record = {"projects": project_names, "parent": parent_gid}
+            ttl = ancestry_ttl if project_names or parent_gid else ancestry_negative_ttl
+            pipe.set(ancestry_key(gid), json.dumps(record, ensure_ascii=False), ex=ttl)
+        
+        pipe.execute()
+        
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while caching task ancestry")
+
+
+# DROP cached ancestry, e.g. when a task was moved to another parent or project
+def invalidate_ancestry(task_gids):
+    
+    keys = [ancestry_key(gid) for gid in task_gids]
+    if not keys:
+        return
+    
+    try:
+        redis_client.delete(*keys)
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while invalidating task ancestry")
+
+
+def get_ancestry_cache_stats():
+    with stats_lock:
+        stats = dict(ancestry_stats)
+    
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    
+    return stats
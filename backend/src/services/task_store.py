@@ -0,0 +1,151 @@
+import json
+import redis.exceptions
+
+from config.load_env import task_store_ttl, task_store_fresh_ttl
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.redis_client import get_redis_client
+redis_client = get_redis_client()
+
+
+# task gid -> task record of a user's today tasks
+def task_store_key(user_id):
+    return f"task_store:{user_id}"
+
+
+# list / sections the store was synced from and the task order of the last sync
+def task_store_meta_key(user_id):
+    return f"task_store_meta:{user_id}"
+
+
+# set while an asana webhook pushes task changes of the user
+def task_store_push_key(user_id):
+    return f"task_store_push:{user_id}"
+
+
+# set after a sync of a push user, dropped by the next webhook event
+def task_store_fresh_key(user_id):
+    return f"task_store_fresh:{user_id}"
+
+
+# bumped by every webhook event, a sync that started before an event must not mark the store fresh
+def task_store_generation_key(user_id):
+    return f"task_store_gen:{user_id}"
+
+
+# LOAD stored tasks and sync meta of a user, ({}, None) on errors
+# meta['push'] / meta['fresh'] tell whether the store may be served without asking asana,
+# meta['generation'] goes back to write_task_store with the sync's result
+def load_task_store(user_id):
+    
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hgetall(task_store_key(user_id))
+        pipe.get(task_store_meta_key(user_id))
+        pipe.exists(task_store_push_key(user_id))
+        pipe.exists(task_store_fresh_key(user_id))
+        pipe.get(task_store_generation_key(user_id))
+        stored, meta, push, fresh, generation = pipe.execute()
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while reading task store of user: {user_id}")
+        return {}, None
+    
+    if meta is None:
+        return {}, {"push": bool(push), "fresh": False, "generation": generation}
+    
+    meta = json.loads(meta)
+    meta['push'] = bool(push)
+    meta['fresh'] = bool(fresh)
+    meta['generation'] = generation
+    
+    return {gid: json.loads(record) for gid, record in stored.items()}, meta
+
+
+# WRITE synced tasks: changed records are set, removed ones dropped, replace clears the store first
+# generation is the one load_task_store returned before the sync listed the tasks
+def write_task_store(user_id, changed, removed, meta, replace=False, push=False, generation=None):
+    
+    store_key = task_store_key(user_id)
+    
+    try:
+        pipe = redis_client.pipeline()
+        
+        if replace:
+            pipe.delete(store_key)
+        elif removed:
+            pipe.hdel(store_key, *removed)
+        
+        if changed:
+            pipe.hset(store_key, mapping={
+                gid: json.dumps(record, ensure_ascii=False) for gid, record in changed.items()
+            })
+        
+        pipe.expire(store_key, task_store_ttl)
+        pipe.set(task_store_meta_key(user_id), json.dumps(meta), ex=task_store_ttl)
+        pipe.execute()
+        
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while writing task store of user: {user_id}")
+        return
+    
+    # webhook events keep the store current, fresh_ttl bounds the damage of missed events
+    if push:
+        mark_task_store_fresh(user_id, generation)
+
+
+# MARK the store fresh unless a webhook event came in since the sync started, True if marked
+# an event bumps the generation after it drops the fresh key, WATCH makes the check and the set atomic
+def mark_task_store_fresh(user_id, generation):
+    
+    generation_key = task_store_generation_key(user_id)
+    
+    try:
+        with redis_client.pipeline() as pipe:
+            pipe.watch(generation_key)
+            
+            if pipe.get(generation_key) != generation:
+                logger.info(f"task store of user: {user_id} changed during sync, not marked fresh")
+                return False
+            
+            pipe.multi()
+            pipe.set(task_store_fresh_key(user_id), 1, ex=task_store_fresh_ttl)
+            pipe.execute()
+            return True
+        
+    except redis.exceptions.WatchError:
+        logger.info(f"task store of user: {user_id} changed during sync, not marked fresh")
+        return False
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while marking task store of user: {user_id} fresh")
+        return False
+
+
+# DROP tasks from a user's store, they are fetched in full on the next sync
+# the store stops being fresh, so the next call syncs with asana, and syncs in flight can't mark it fresh again
+def invalidate_tasks(user_id, task_gids):
+    
+    try:
+        pipe = redis_client.pipeline()
+        if task_gids:
+            pipe.hdel(task_store_key(user_id), *task_gids)
+        pipe.delete(task_store_fresh_key(user_id))
+        pipe.incr(task_store_generation_key(user_id))
+        pipe.expire(task_store_generation_key(user_id), task_store_ttl)
+        pipe.execute()
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while invalidating task store of user: {user_id}")
+
+
+# TURN PUSH on / off for a user, on: a webhook for the user's task list completed its handshake
+def set_task_store_push(user_id, enabled):
+    
+    try:
+        if enabled:
+            redis_client.set(task_store_push_key(user_id), 1)
+        else:
+            redis_client.delete(task_store_push_key(user_id), task_store_fresh_key(user_id))
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while setting task store push of user: {user_id}")
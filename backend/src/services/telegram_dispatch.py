@@ -0,0 +1,143 @@
+import asyncio
+import random
+from collections import OrderedDict
+from datetime import timedelta
+from telegram.error import RetryAfter, BadRequest, NetworkError, TelegramError
+
+from config.load_env import (tg_global_rate,
+                             tg_chat_rate,
+                             tg_group_rate,
+                             tg_group_burst,
+                             tg_max_retries,
+                             tg_backoff,
+                             tg_backoff_max,
+                             tg_chat_buckets)
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.asana_client import TokenBucket
+
+# every send takes a token from the global bucket and from its chat's bucket
+# chat buckets are kept for the tg_chat_buckets most recently used chats
+global_bucket = TokenBucket(tg_global_rate, tg_global_rate)
+chat_buckets = OrderedDict()
+
+# one sender per chat at a time, so messages of a chat keep their order
+# chat_id -> [lock, senders using it], dropped when the last sender is done
+chat_locks = {}
+
+
+def get_chat_bucket(chat_id):
+    bucket = chat_buckets.get(chat_id)
+    
+    if bucket is None:
+        # group / channel ids are negative
+        if int(chat_id) < 0:
+            bucket = TokenBucket(tg_group_rate / 60, tg_group_burst)
+        else:
+            bucket = TokenBucket(tg_chat_rate, 1)
+        chat_buckets[chat_id] = bucket
+        
+        while len(chat_buckets) > tg_chat_buckets:
+            chat_buckets.popitem(last=False)
+    
+    chat_buckets.move_to_end(chat_id)
+    return bucket
+
+
+def acquire_chat_lock(chat_id):
+    entry = chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    return entry[0]
+
+
+def release_chat_lock(chat_id):
+    entry = chat_locks[chat_id]
+    entry[1] -= 1
+    
+    if not entry[1]:
+        del chat_locks[chat_id]
+
+
+def retry_seconds(err):
+    retry_after = err.retry_after
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+def backoff_delay(attempt):
+    # full jitter exponential backoff, capped
+    return random.uniform(0, min(tg_backoff_max, tg_backoff * 2 ** attempt))
+
+
+# SEND a message within the global and per chat limits, None if it failed
+# resent after RetryAfter and transient network errors / timeouts, a timed out send may arrive twice
+async def send_message(bot, chat_id, text, **kwargs):
+    
+    chat_bucket = get_chat_bucket(chat_id)
+    
+    for attempt in range(tg_max_retries + 1):
+        wait = max(global_bucket.reserve(), chat_bucket.reserve())
+        if wait:
+            await asyncio.sleep(wait)
+    
+        try:
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+    
+        except RetryAfter as err:
+            delay = retry_seconds(err)
+            logger.warning(f"telegram flood limit on chat {chat_id}, retrying in {delay:.0f}s")
+    
+            # the chat's next sends wait as well
+            chat_bucket.pause(delay)
+    
+        # BadRequest is a NetworkError in PTB, but resending the same request won't help
+        except BadRequest as err:
+            logger.error(f"error sending message to chat {chat_id}: {err}")
+            return None
+    
+        except NetworkError as err:
+            if attempt == tg_max_retries:
+                break
+    
+            delay = backoff_delay(attempt)
+            logger.warning(f"network error: {err} sending to chat {chat_id}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+        except TelegramError as err:
+            logger.error(f"error sending message to chat {chat_id}: {err}")
+            return None
+    
+    logger.error(f"message to chat {chat_id} dropped after {tg_max_retries} retries")
+    return None
+
+
+# SEND messages to a chat in order, returns the number sent
+async def send_messages(bot, chat_id, texts, **kwargs):
+    
+    sent = 0
+    
+    lock = acquire_chat_lock(chat_id)
+    
+    try:
+        async with lock:
+            for text in texts:
+                if await send_message(bot, chat_id, text, **kwargs) is not None:
+                    sent += 1
+    finally:
+        release_chat_lock(chat_id)
+    
+    return sent
+
+
+# DISPATCH messages to many chats at once: {chat_id: [texts]} -> {chat_id: sent}
+async def dispatch(bot, outbox, **kwargs):
+    
+    chat_ids = list(outbox)
+    results = await asyncio.gather(*(send_messages(bot, chat_id, outbox[chat_id], **kwargs) for chat_id in chat_ids))
+    
+    for chat_id, sent in zip(chat_ids, results):
+        if sent < len(outbox[chat_id]):
+            logger.error(f"{len(outbox[chat_id]) - sent} of {len(outbox[chat_id])} messages not sent to chat {chat_id}")
+    
+    return dict(zip(chat_ids, results))
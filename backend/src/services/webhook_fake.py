@@ -0,0 +1,104 @@
+import sys
+import json
+import secrets
+import requests
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.webhook_service import expect_handshake, handle_webhook, sign_body
+
+# LOCAL FAKE of asana's webhook deliveries: handshake, then events signed with sign_body
+# runs handle_webhook in process, or posts to a running server with --url
+# use a test user_id - the fake replaces the user's webhook secret and drops their cached tasks
+# python -m services.webhook_fake [user_id] [--url http://localhost:5000/asana/webhook]
+
+
+def sample_events(task_gids):
+    return {
+        "events": [
+            {
+                "action": "changed",
+                "resource": {"gid": gid, "resource_type": "task"},
+                "parent": None,
+                "change": {"field": "name", "action": "changed"},
+            }
+            for gid in task_gids
+        ] + [
+            # non-task events are delivered too and must not count as tasks
+            {"action": "added", "resource": {"gid": "900", "resource_type": "story"}},
+        ]
+    }
+
+
+# DELIVER in process, as the flask route does: (status, headers, payload)
+def direct_post(user_id, headers, body):
+    events = json.loads(body).get('events', []) if body else []
+    payload, status, response_headers = handle_webhook(str(user_id), headers, body, events)
+    return status, response_headers, payload
+
+
+# DELIVER over http to a running server
+def http_poster(url):
+    
+    def http_post(user_id, headers, body):
+        response = requests.post(url,
+                                 params={"user_id": user_id},
+                                 headers={"Content-Type": "application/json", **headers},
+                                 data=body,
+                                 timeout=10)
+        return response.status_code, response.headers, response.json()
+    
+    return http_post
+
+
+# RUN the deliveries in order, returns the names of the failed checks
+def run_fake(user_id, post=direct_post):
+    
+    failed = []
+    
+    def check(name, ok, result):
+        logger.info(f"{'ok' if ok else 'FAILED'} - {name}: {result}")
+        if not ok:
+            failed.append(name)
+    
+    hook_secret = secrets.token_hex(16)
+    
+    # a handshake the bot didn't ask for is refused
+    result = post(user_id, {"X-Hook-Secret": secrets.token_hex(16)}, b'')
+    check("unexpected handshake", result[0] == 403, result)
+    
+    # handshake on webhook creation, the secret is echoed back
+    expect_handshake(user_id)
+    result = post(user_id, {"X-Hook-Secret": hook_secret}, b'')
+    check("handshake", result[0] == 200 and result[1].get('X-Hook-Secret') == hook_secret, result)
+    
+    task_gids = ["1201", "1202"]
+    body = json.dumps(sample_events(task_gids)).encode('utf-8')
+    
+    result = post(user_id, {"X-Hook-Signature": sign_body(secrets.token_hex(16), body)}, body)
+    check("bad signature", result[0] == 401, result)
+    
+    result = post(user_id, {}, body)
+    check("missing signature", result[0] == 401, result)
+    
+    result = post(user_id, {"X-Hook-Signature": sign_body(hook_secret, body)}, body)
+    check("signed events", result[0] == 200 and result[2].get('tasks') == len(task_gids), result)
+    
+    return failed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    
+    args = sys.argv[1:]
+    url = None
+    
+    if "--url" in args:
+        url = args[args.index("--url") + 1]
+        args = [arg for arg in args if arg not in ("--url", url)]
+    
+    user_id = args[0] if args else "0"
+    failed = run_fake(user_id, http_poster(url) if url else direct_post)
+    
+    sys.exit(1 if failed else 0)
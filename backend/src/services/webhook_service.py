@@ -0,0 +1,176 @@
+import sys
+import hmac
+import hashlib
+import urllib.parse
+import requests
+import redis.exceptions
+
+from config.load_env import webhook_url, workspace_gid
+
+import logging
+logger = logging.getLogger(__name__)
+
+from services.redis_client import get_redis_client
+redis_client = get_redis_client()
+
+from services.asana_client import asana_post, asana_api_url
+from services.task_cache import invalidate_ancestry
+from services.task_store import invalidate_tasks, set_task_store_push
+
+
+# X-Hook-Secret of the webhook delivering a user's task list events
+def webhook_secret_key(user_id):
+    return f"webhook_secret:{user_id}"
+
+
+# set while the bot itself creates a webhook, only then a handshake is accepted
+def webhook_pending_key(user_id):
+    return f"webhook_pending:{user_id}"
+
+
+def expect_handshake(user_id):
+    redis_client.set(webhook_pending_key(user_id), 1, ex=60)
+
+
+# ACCEPT a handshake: the secret is stored only for a webhook the bot is creating
+def accept_handshake(user_id, hook_secret):
+    
+    try:
+        if not redis_client.delete(webhook_pending_key(user_id)):
+            logger.warning(f"unexpected webhook handshake for user: {user_id}")
+            return False
+    
+        redis_client.set(webhook_secret_key(user_id), hook_secret)
+        set_task_store_push(user_id, True)
+        return True
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while storing webhook secret for user: {user_id}")
+        return False
+
+
+def get_webhook_secret(user_id):
+    
+    try:
+        return redis_client.get(webhook_secret_key(user_id))
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while reading webhook secret for user: {user_id}")
+        return None
+
+
+# X-Hook-Signature: hex HMAC-SHA256 of the raw body keyed with the hook secret
+def sign_body(secret, body):
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, body, signature):
+    
+    if not secret or not signature:
+        return False
+    
+    return hmac.compare_digest(sign_body(secret, body), signature)
+
+
+# TASK GIDS touched by a list of webhook events
+def task_gids_from_events(events):
+    
+    task_gids = []
+    
+    for event in events:
+        resource = event.get('resource') or {}
+    
+        if resource.get('resource_type') == 'task' and resource.get('gid') not in task_gids:
+            task_gids.append(resource['gid'])
+    
+    return task_gids
+
+
+# APPLY events: changed tasks leave the ancestry cache and the user's task store
+def apply_task_events(events, user_id):
+    
+    task_gids = task_gids_from_events(events)
+    
+    if task_gids:
+        invalidate_ancestry(task_gids)
+    
+    # any event may change the today sections, the next /mytasks syncs with asana
+    if events:
+        invalidate_tasks(user_id, task_gids)
+    
+    logger.info(f"webhook: {len(events)} events, {len(task_gids)} tasks changed for user: {user_id}")
+    return task_gids
+
+
+# HANDLE a webhook delivery, returns (body, status, headers) for the flask route
+def handle_webhook(user_id, headers, body, events):
+    
+    if not user_id or not user_id.isdigit():
+        return {"message": "user_id is missing"}, 400, {}
+    
+    # handshake on webhook creation: echo the secret back
+    hook_secret = headers.get('X-Hook-Secret')
+    if hook_secret:
+        if not accept_handshake(user_id, hook_secret):
+            return {"message": "unexpected handshake"}, 403, {}
+    
+        logger.info(f"webhook handshake done for user: {user_id}")
+        return {}, 200, {'X-Hook-Secret': hook_secret}
+    
+    if not verify_signature(get_webhook_secret(user_id), body, headers.get('X-Hook-Signature')):
+        logger.warning(f"invalid webhook signature for user: {user_id}")
+        return {"message": "invalid signature"}, 401, {}
+    
+    task_gids = apply_task_events(events, user_id)
+    return {"tasks": len(task_gids)}, 200, {}
+
+
+# CREATE a webhook on a user's task list, asana runs the handshake before it responds
+def register_webhook(user_id, list_gid, user_token):
+    
+    target = f"{webhook_url}?{urllib.parse.urlencode({'user_id': user_id})}"
+    payload = {
+        "data": {
+            "resource": list_gid,
+            "target": target,
+            "filters": [{"resource_type": "task"}]
+        }
+    }
+    
+    try:
+        expect_handshake(user_id)
+        
+        # sent once: a retry after a lost response would find the pending handshake used up
+        # and leave the first webhook behind
+        response = asana_post(f"{asana_api_url}/webhooks", json=payload, token=user_token, retries=0)
+        response.raise_for_status()
+    
+        webhook_gid = response.json()['data']['gid']
+        logger.info(f"webhook {webhook_gid} created on list {list_gid} for user: {user_id}")
+        return webhook_gid
+    
+    except redis.exceptions.RedisError as err:
+        logger.error(f"Redis error: {err} while creating webhook for user: {user_id}")
+        return None
+    
+    except requests.exceptions.RequestException as err:
+        logger.error(f"error: {err} while creating webhook for user: {user_id}")
+        return None
+
+
+# python -m services.webhook_service <user_id> [<user_id> ...]
+if __name__ == "__main__":
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    
+    from services.asana_data import get_redis_data, get_list_gid
+    
+    failed = False
+    
+    for user_id in sys.argv[1:]:
+        user_gid, user_name, user_token, tg_user = get_redis_data(user_id)
+        list_gid = get_list_gid(user_id, user_gid, user_token, workspace_gid) if user_token else None
+    
+        if list_gid is None or register_webhook(user_id, list_gid, user_token) is None:
+            logger.error(f"no webhook for user: {user_id}")
+            failed = True
+    
+    sys.exit(1 if failed else 0)